@@ -6,25 +6,34 @@ A quick and dirty parser for ArXiv
 
 from __future__ import (absolute_import, division, print_function)
 import sys
-import traceback
 import operator
 import re
 from glob import glob
 import os
-import subprocess
-
-from html.parser import HTMLParser
-from urllib.request import urlopen
-import tarfile
 import shutil
 import locale
 import codecs
-
-import inspect
-import qrcode
+import collections
+import hashlib
+import struct
+import threading
+import functools
+import contextlib
+import io
+import time
 
 #directories
-__ROOT__ = '/'.join(os.path.abspath(inspect.getfile(inspect.currentframe())).split('/')[:-1])
+__ROOT__ = os.path.dirname(os.path.abspath(__file__))
+__CACHE__ = __ROOT__ + '/cache'
+
+# version of the source parsing: increase it when the parsing changes to
+# invalidate the cached documents (see load_document_source)
+PARSER_VERSION = 2
+
+# sources larger than this (characters of the source, bytes of its files) are
+# parsed in large document mode: files are memory-mapped and the document
+# body is not kept (see Document)
+LARGE_DOCUMENT = 1 << 24
 
 
 PY3 = sys.version_info[0] > 2
@@ -43,31 +52,105 @@ else:
 
 __DEBUG__ = False
 
-def make_qrcode(identifier):
+# serializes the generation of precompiled preamble formats
+_FORMAT_LOCK = threading.Lock()
+
+def make_qrcode(identifier, directory=None):
+    import qrcode
+    if directory is None:
+        directory = __ROOT__ + '/tmp'
     qr = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_H)
     qr.add_data('https://www.arxiv.org/abs/{:s}'.format(identifier))
     qr.make(fit=True)
     img = qr.make_image(fill_color="black", back_color="white")
-    img.save(__ROOT__ + '/tmp/qrcode.pdf',format='pdf')
+    img.save(directory + '/qrcode.pdf',format='pdf')
+
+
+@functools.lru_cache(maxsize=1024)
+def qrcode_matrix(identifier):
+    """ QR code modules of the abstract page of a paper
+
+    Parameters
+    ----------
+    identifier: str
+        arxiv identifier
+
+    Returns
+    -------
+    matrix: tuple(tuple(bool))
+        rows of modules, True for dark ones
+    """
+    import qrcode
+    qr = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_H)
+    qr.add_data('https://www.arxiv.org/abs/{:s}'.format(identifier))
+    qr.make(fit=True)
+    return tuple(tuple(row) for row in qr.get_matrix())
+
+
+@functools.lru_cache(maxsize=1024)
+def qrcode_to_latex(identifier):
+    """ QR code of a paper as a TeX picture
+
+    Runs of dark modules of each row are drawn as rules, one module being
+    one unit of length.
 
-def raise_or_warn(exception, limit=5, file=sys.stdout, debug=False):
-    """ Raise of warn for exceptions. This helps debugging """
+    Parameters
+    ----------
+    identifier: str
+        arxiv identifier
+
+    Returns
+    -------
+    txt: str
+        picture environment drawing the code
+    """
+    matrix = qrcode_matrix(identifier)
+    size = len(matrix)
+    puts = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            puts.append(r'\put({0:d},{1:d}){{\rule{{{2:d}\unitlength}}{{\unitlength}}}}'.format(
+                start, size - y - 1, x - start))
+    txt = r'\begingroup\setlength{\unitlength}{1pt}'
+    txt += r'\begin{{picture}}({0:d},{0:d})'.format(size) + '%\n'
+    txt += '%\n'.join(puts) + '%\n'
+    txt += r'\end{picture}\endgroup'
+    return txt
+
+def raise_or_warn(exception, limit=5, file=sys.stdout, debug=False, verbose=True):
+    """ Raise of warn for exceptions. This helps debugging
+
+    Nothing is printed if not verbose (exceptions are still raised in debug mode)
+    """
     if (__DEBUG__) or (debug):
         raise exception
-    else:
+    elif verbose:
+        import traceback
         exc_type, exc_value, exc_traceback = sys.exc_info()
         color_print('*** print_tb', 'green')
         traceback.print_tb(exc_traceback, limit=limit, file=file)
         print(exception, '\n')
 
 
-def balanced_braces(args):
+_BRACES = re.compile(r'[{}]')
+
+
+def balanced_braces(args, maxparts=None):
     """ Find tokens between {}
 
     Parameters
     ----------
     args: list or str
         data to parse
+    maxparts: int, optional
+        stop parsing once that many parts are found
 
     Returns
     -------
@@ -75,30 +158,27 @@ def balanced_braces(args):
         extracted parts
     """
     if isinstance(args, basestring):
-        return balanced_braces([args])
+        return balanced_braces([args], maxparts)
     parts = []
     for arg in args:
         if '{' not in arg:
             continue
-        chars = []
-        rest = []
+        if maxparts is not None and len(parts) >= maxparts:
+            break
         num = 0
-        for char in arg:
-            if char == '{':
-                if num > 0:
-                    chars.append(char)
+        start = 0
+        # jump from brace to brace instead of walking every character
+        for match in _BRACES.finditer(arg):
+            if match.group() == '{':
+                if num == 0:
+                    start = match.end()
                 num += 1
-            elif char == '}':
-                num -= 1
-                if num > 0:
-                    chars.append(char)
-                elif num == 0:
-                    parts.append(''.join(chars).lstrip().rstrip())
-                    chars = []
-            elif num > 0:
-                chars.append(char)
             else:
-                rest.append(char)
+                num -= 1
+                if num == 0:
+                    parts.append(arg[start:match.start()].strip())
+                    if maxparts is not None and len(parts) >= maxparts:
+                        break
     return parts
 
 _DEFAULT_ENCODING = 'utf-8'
@@ -320,10 +400,11 @@ def get_latex_header(data):
     return data[:end]
 
 
-def get_latex_macros(data):
+def get_latex_macros(data, verbose=True):
     """ Extract defined commands in the document header """
     header = get_latex_header(data)
-    macros = '\n'.join(re.compile(r'command{.*}').findall(header))
+    macros = '\n'.join(header[start:end] for start, end in
+                       _spans_to_last(header, re.escape('command{'), '}'))
     macros = macros.replace('command', '\\providecommand')
     macros = macros.replace('\\new\\provide', '\n\\provide')
     macros = macros.replace('\\provide\\provide', '\n\\provide')
@@ -336,31 +417,118 @@ def get_latex_macros(data):
     defs = defs + [k for k in re.compile(r'\\graphicspath.*').findall(header)
                    if len(balanced_braces(k)) > 0]
     macros += '\n'.join(defs)
-    print('*** Found macros and definitions in the header: ')
+    if verbose:
+        print('*** Found macros and definitions in the header: ')
     return macros
 
 
+@functools.lru_cache(maxsize=None)
+def _inclusion_pattern(command):
+    """ \\command followed by a braced argument (group 1) or a word (group 2) """
+    return re.compile(r'\\{0:s}(?![a-zA-Z@])\s*(?:\{{([^{{}}\n]*)\}}|([^\s{{}}%\\]+))'.format(command))
+
+
+# line boundaries of str.splitlines
+_LINE_BREAKS = '\n\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029'
+_LINE_BREAK = re.compile(r'\r\n|[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]')
+_COMMENT = re.compile(r'(?<!\\)%[^\n]*')
+_COMMENT_LINE = re.compile(r'(?<!\\)%.*\n')
+
+
 def clear_comments(data):
-    """ clean text from any comment """
-    lines = []
-    for line in data.splitlines():
-        try:
-            start = list(re.compile(r'(?<!\\)%').finditer(line))[0].span()[0]
-            lines.append(line[:start])
-        except IndexError:
-            lines.append(line)
-    return '\n'.join(lines)
+    """ clean text from any comment
+
+    Lines are joined by newlines and the last line break is dropped, as
+    '\\n'.join(data.splitlines()) would do, without splitting the text.
+    """
+    last_break = data[-1:] != '' and data[-1] in _LINE_BREAKS
+    if any(char in data for char in _LINE_BREAKS[1:]):
+        data = _LINE_BREAK.sub('\n', data)
+    if '%' in data:
+        data = _COMMENT.sub('', data)
+    if last_break:
+        data = data[:-1]
+    return data
+
+
+def _line_spans(data, token):
+    """ (start, end) of the lines of data containing token
+
+    Same spans as the matches of ``'.*' + token + '.*'``: the regular
+    expression retries the rest of the line from every position of a line
+    that does not contain token, which is quadratic in its length. Here every
+    line is searched once.
+    """
+    spans = []
+    where = data.find(token)
+    while where >= 0:
+        start = data.rfind('\n', 0, where) + 1
+        end = data.find('\n', where)
+        if end < 0:
+            end = len(data)
+        spans.append((start, end))
+        where = data.find(token, end)
+    return spans
+
+
+def _spans_to_last(data, opening, closing):
+    """ (start, end) of the matches of ``opening + '.*' + closing``
+
+    Parameters
+    ----------
+    data: str
+        text to search
+    opening: str
+        regular expression
+    closing: str
+        text ending the matches (the last one on the line of opening)
+
+    The regular expression backtracks over the rest of the line from every
+    opening it finds. Here the line of an opening is searched for closing
+    once and the next opening is searched from the following line.
+    """
+    spans = []
+    pattern = re.compile(opening)
+    match = pattern.search(data)
+    while match is not None:
+        end = data.find('\n', match.end())
+        if end < 0:
+            end = len(data)
+        last = data.rfind(closing, match.end(), end)
+        if last >= 0:
+            spans.append((match.start(), last + len(closing)))
+        match = pattern.search(data, end)
+    return spans
+
+
+def _command_spans(data, name):
+    """ (start, end) of the matches of ``r'\\\\([^\\s]*)' + name``
+
+    Each match runs from the first backslash of a word to the last
+    occurrence of name in that word. Words are matched once instead of
+    backtracking over them from each of their backslashes.
+    """
+    spans = []
+    for word in re.finditer(r'\\\S*', data):
+        last = data.rfind(name, word.start() + 1, word.end())
+        if last >= 0:
+            spans.append((word.start(), last + len(name)))
+    return spans
 
 
 def get_latex_figures(data):
-    """ Extract figure declarations """
-    starts = [k.span()[0] for k in re.compile(r'(?<!%).*begin{figure').finditer(data)]
-    ends = [k.span()[1] for k in re.compile(r'(?<!%).*end{figure.*').finditer(data)]
+    """ Extract figure declarations
+
+    A figure goes from the start of the line of its begin{figure to the end
+    of the line of the matching end{figure.
+    """
+    starts = [start for start, _ in _line_spans(data, 'begin{figure')]
+    ends = [end for _, end in _line_spans(data, 'end{figure')]
     figures = [data[a: b] for a, b in zip(starts, ends)]
     return figures
 
 
-def parse_command(command, code, tokens=1):
+def parse_command(command, code, tokens=1, verbose=True):
     """
     Parse code to find a command arguments
 
@@ -375,30 +543,38 @@ def parse_command(command, code, tokens=1):
     tokens: int
         number of arguments to find
 
+    verbose: bool
+        set to print the errors
+
     Returns
     -------
     next_token: sequence or str
         found arguments
     """
     safe = command.replace('\\', '')
-    options = re.findall(safe + '\s*\[.*\]', code)
+    options = _spans_to_last(code, safe + r'\s*\[', ']')[:1]
     try:
-        where = list(re.compile(r'\\' + safe).finditer(code))[0].span()[1]
+        match = re.compile(r'\\' + safe).search(code)
+        if match is None:
+            raise IndexError('no {0:s} command'.format(command))
+        where = match.end()
         if options:  # empty sequences are False
-            opt = options[0]
+            start, end = options[0]
+            opt = code[start:end]
             code = code.replace(opt.replace(command, ''), '')
-        next_token = balanced_braces(code[where:])[:tokens]
+        next_token = balanced_braces(code[where:], tokens)[:tokens]
         if tokens == 1:
             return next_token[0]
         return next_token
     except Exception as e:
-        print("parse_command({0:s}, code, tokens={1:d}) error".format(command,
-            tokens))
-        print(e)
+        if verbose:
+            print("parse_command({0:s}, code, tokens={1:d}) error".format(command,
+                tokens))
+            print(e)
         raise e
 
 
-def parse_command_multi(command, code, tokens=1):
+def parse_command_multi(command, code, tokens=1, verbose=True):
     """
     Parse code to find a command arguments and handles repeated command
 
@@ -413,6 +589,9 @@ def parse_command_multi(command, code, tokens=1):
     tokens: int
         number of arguments to find
 
+    verbose: bool
+        set to print the errors
+
     Returns
     -------
     next_token: sequence or str
@@ -423,11 +602,675 @@ def parse_command_multi(command, code, tokens=1):
         code = code.replace(r'\fig{', r'\FIG{')
     else:
         safe = command.replace('\\', '')
-    pieces = [code[r.start()-1:] for r in re.finditer(safe, code)]
-    ret = [parse_command(safe, pk, tokens=tokens) for pk in pieces]
+    # one piece at a time: each is the whole rest of the code
+    ret = [parse_command(safe, code[r.start()-1:], tokens=tokens, verbose=verbose)
+           for r in re.finditer(safe, code)]
     return ret
 
 
+class _LRUCache(object):
+    """ Mapping keeping the maxsize most recently used entries
+
+    Module level caches use it so that a long running process (e.g., the
+    --daemon of mpia.py) does not grow with every file it sees.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# hashes of the files recently read, by path, size and modification time
+_FILE_HASHES = _LRUCache(maxsize=4096)
+
+
+def file_hash(fname, blocksize=1 << 20):
+    """ Hash of the content of a file
+
+    Parameters
+    ----------
+    fname: str
+        file to hash
+
+    blocksize: int
+        size of the chunks read at once
+
+    Returns
+    -------
+    digest: str
+        sha1 hex digest of the content
+    """
+    stat = os.stat(fname)
+    key = (os.path.abspath(fname), stat.st_size, stat.st_mtime_ns)
+    digest = _FILE_HASHES.get(key)
+    if digest is None:
+        sha = hashlib.sha1()
+        with open(fname, 'rb') as fin:
+            for chunk in iter(lambda: fin.read(blocksize), b''):
+                sha.update(chunk)
+        digest = _FILE_HASHES[key] = sha.hexdigest()
+    return digest
+
+
+def text_hash(text, blocksize=1 << 20):
+    """ Hash of a text
+
+    The text is encoded by blocks, as utf-8 with escaped surrogates, so that
+    large texts are not copied at once.
+
+    Returns
+    -------
+    digest: str
+        sha1 hex digest of the encoded text
+    """
+    sha = hashlib.sha1()
+    for start in range(0, len(text), blocksize):
+        sha.update(text[start:start + blocksize].encode('utf-8', 'surrogateescape'))
+    return sha.hexdigest()
+
+
+def read_text(fname):
+    """ Content of a text file, as read by open(fname, errors='surrogateescape')
+
+    Files larger than LARGE_DOCUMENT are memory-mapped and decoded from the
+    mapping, which spares the copy of the whole file that read makes before
+    decoding.
+    """
+    if os.path.getsize(fname) <= LARGE_DOCUMENT:
+        with open(fname, 'r', errors="surrogateescape") as finput:
+            return finput.read()
+    import mmap
+    with open(fname, 'rb') as finput:
+        with mmap.mmap(finput.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            text = str(mapped, locale.getpreferredencoding(False), 'surrogateescape')
+    # universal newlines, as in text mode
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _png_size(fin):
+    """ width and height from the IHDR chunk """
+    header = fin.read(24)
+    if header[:8] != b'\x89PNG\r\n\x1a\n' or header[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', header[16:24])
+
+
+def _jpeg_size(fin):
+    """ width and height from the first start of frame marker """
+    if fin.read(2) != b'\xff\xd8':
+        return None
+    while True:
+        byte = fin.read(1)
+        while byte and byte != b'\xff':
+            byte = fin.read(1)
+        while byte == b'\xff':
+            byte = fin.read(1)
+        if not byte:
+            return None
+        marker = ord(byte)
+        if marker in (0x01, 0xd8) or 0xd0 <= marker <= 0xd7:
+            continue   # markers without length
+        length = fin.read(2)
+        if len(length) < 2:
+            return None
+        length = struct.unpack('>H', length)[0]
+        if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+            data = fin.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack('>HH', data[1:5])
+            return width, height
+        fin.seek(length - 2, os.SEEK_CUR)
+
+
+def _search_head_and_tail(fin, regex, blocksize=65536):
+    """ search the beginning and the end of a file for a pattern """
+    match = regex.search(fin.read(blocksize))
+    if match is None:
+        fin.seek(0, os.SEEK_END)
+        fin.seek(max(fin.tell() - blocksize, 0))
+        match = regex.search(fin.read(blocksize))
+    return match
+
+
+_PDF_MEDIABOX = re.compile(br'/MediaBox\s*\[\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s*\]')
+_EPS_BOUNDINGBOX = re.compile(br'%%BoundingBox:\s*([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)\s+([-\d.]+)')
+
+
+def _box_size(match):
+    """ width and height of a box match """
+    if match is None:
+        return None
+    x0, y0, x1, y1 = [float(k) for k in match.groups()]
+    return abs(x1 - x0), abs(y1 - y0)
+
+
+def _pdf_size(fin):
+    """ width and height of the first MediaBox found """
+    return _box_size(_search_head_and_tail(fin, _PDF_MEDIABOX))
+
+
+def _eps_size(fin):
+    """ width and height from the BoundingBox comment """
+    header = fin.read(30)
+    if header[:4] == b'\xc5\xd0\xd3\xc6':
+        # DOS EPS binary header: offset and length of the postscript part
+        offset, length = struct.unpack('<II', header[4:12])
+        fin.seek(offset)
+        return _box_size(_EPS_BOUNDINGBOX.search(fin.read(min(length, 65536))))
+    fin.seek(0)
+    return _box_size(_search_head_and_tail(fin, _EPS_BOUNDINGBOX))
+
+
+_IMAGE_PROBES = {'.png': _png_size, '.jpg': _jpeg_size, '.jpeg': _jpeg_size,
+                 '.pdf': _pdf_size, '.eps': _eps_size, '.ps': _eps_size}
+
+# probed dimensions of the recent images by file hash
+_IMAGE_SIZES = _LRUCache(maxsize=4096)
+
+# marks images not probed yet (None is a valid result)
+_UNKNOWN = object()
+
+
+def image_size(fname):
+    """ Dimensions of an image from its header only
+
+    Reads PNG and JPEG headers, the PDF MediaBox and the EPS BoundingBox.
+    Results are cached by file hash.
+
+    Parameters
+    ----------
+    fname: str
+        image file
+
+    Returns
+    -------
+    size: tuple
+        (width, height) in pixels or points, None if unknown
+    """
+    probe = _IMAGE_PROBES.get(os.path.splitext(fname)[1].lower())
+    if probe is None or not os.path.isfile(fname):
+        return None
+    key = file_hash(fname)
+    size = _IMAGE_SIZES.get(key, _UNKNOWN)
+    if size is _UNKNOWN:
+        try:
+            with open(fname, 'rb') as fin:
+                size = probe(fin)
+        except (IOError, OSError, struct.error, ValueError):
+            size = None
+        if size is not None and min(size) <= 0:
+            size = None
+        _IMAGE_SIZES[key] = size
+    return size
+
+
+# same order as \DeclareGraphicsExtensions in the templates
+GRAPHICS_EXTENSIONS = ('.jpg', '.ps', '.eps', '.png', '.pdf')
+
+
+class GraphicsIndex(object):
+    """ Files of a source tree, as TeX would find them from graphics commands
+
+    The tree is walked once. References are resolved like graphicx does:
+    relative to the directory then to each \\graphicspath entry, trying the
+    extensions in the \\DeclareGraphicsExtensions order when the name has
+    none.
+
+    Parameters
+    ----------
+    directory: str
+        source directory
+    extensions: seq
+        extensions tried in order if a reference has none
+    graphicspath: seq
+        other directories searched, relative to the source directory
+    """
+    def __init__(self, directory, extensions=GRAPHICS_EXTENSIONS, graphicspath=()):
+        self.directory = directory
+        self.extensions = tuple(extensions)
+        self.graphicspath = tuple(graphicspath)
+        self.files = set()
+        for dirpath, _, fnames in os.walk(directory):
+            prefix = os.path.relpath(dirpath, directory)
+            for fname in fnames:
+                self.add(os.path.join(prefix, fname))
+
+    def add(self, path):
+        """ register a file created after the index (e.g., a conversion) """
+        self.files.add(os.path.normpath(path))
+
+    def _candidates(self, fname):
+        fname = fname.replace('{', '').replace('}', '').replace('"', '').strip()
+        for prefix in ('',) + self.graphicspath:
+            path = os.path.normpath(os.path.join(prefix, fname))
+            if os.path.splitext(path)[1] and path in self.files:
+                yield path
+            for ext in self.extensions:
+                yield path + ext
+            yield path
+
+    def resolve(self, fname):
+        """ Find the file TeX would use for a graphics argument
+
+        Parameters
+        ----------
+        fname: str
+            argument of the graphics command
+
+        Returns
+        -------
+        path: str
+            path relative to the directory, None if not found
+        """
+        for path in self._candidates(fname):
+            if path in self.files:
+                return path
+        return None
+
+    def path(self, fname):
+        """ full path of the file used for a graphics argument (or None) """
+        path = self.resolve(fname)
+        if path is None:
+            return None
+        return os.path.join(self.directory, path)
+
+
+def convert_figure(source, target, command, cache_directory=None, key=None,
+                   verbose=True):
+    """ Convert a figure using a content-hashed cache
+
+    Parameters
+    ----------
+    source: str
+        file to convert
+    target: str
+        converted file
+    command: str or callable
+        conversion command with {input} and {output} fields
+        or function(input, output)
+    cache_directory: str
+        where converted files are kept (default: __CACHE__/figures)
+    key: str
+        identifies the conversion in the cache (default: command)
+    verbose: bool
+        set to print the failures and the output of the command
+
+    Returns
+    -------
+    target: str
+        converted file, None if the conversion failed
+    """
+    import subprocess
+    if cache_directory is None:
+        cache_directory = __CACHE__ + '/figures'
+    os.makedirs(cache_directory, exist_ok=True)
+    if key is None:
+        key = command
+    key = hashlib.sha1((file_hash(source) + key).encode('utf8')).hexdigest()
+    ext = os.path.splitext(target)[1]
+    cached = os.path.join(cache_directory, key + ext)
+    if not os.path.isfile(cached):
+        # unique name so that concurrent conversions do not collide
+        tmp = os.path.join(cache_directory, '{0:s}_{1:d}{2:s}'.format(
+            key, threading.get_ident(), ext))
+        if callable(command):
+            try:
+                command(source, tmp)
+            except Exception as error:
+                raise_or_warn(error, verbose=verbose)
+        else:
+            output = None if verbose else subprocess.DEVNULL
+            subprocess.call(command.format(input='"' + source + '"',
+                                           output='"' + tmp + '"'), shell=True,
+                            stdout=output, stderr=output)
+        if not os.path.isfile(tmp):
+            if verbose:
+                color_print('*** Could not convert ' + source, 'red')
+            return None
+        os.replace(tmp, cached)
+    shutil.copyfile(cached, target)
+    return target
+
+
+def downscale_image(source, target, max_pixels):
+    """ Resample a raster image so that its largest side is max_pixels """
+    from PIL import Image
+    img = Image.open(source)
+    img.thumbnail((max_pixels, max_pixels), Image.LANCZOS)
+    img.save(target)
+
+
+def rasterize_figure(source, target, dpi):
+    """ Render the first page of a vector figure to png with ghostscript """
+    import subprocess
+    command = ('gs -q -dSAFER -dBATCH -dNOPAUSE -dEPSCrop -dUseCropBox '
+               '-dFirstPage=1 -dLastPage=1 -sDEVICE=png16m '
+               '-dTextAlphaBits=4 -dGraphicsAlphaBits=4 '
+               '-r{0:d} -sOutputFile="{1:s}" "{2:s}"')
+    subprocess.call(command.format(int(dpi), target, source), shell=True)
+
+
+def _children_cpu():
+    """ CPU time used so far by the finished subprocesses, in seconds """
+    times = os.times()
+    return times[2] + times[3]
+
+
+def _peak_rss():
+    """ peak resident memory of the process in bytes (None if unknown) """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return peak
+    return peak * 1024
+
+
+class Tracer(object):
+    """ Timing spans of the pipeline stages
+
+    Each span records its wall time, the bytes it transferred (set by the
+    code inside the span), the CPU time of the subprocesses that finished
+    during the span and the peak resident memory of the process so far
+    (process_peak_rss: a high-water mark of the whole run, not of the span).
+    Stages do not nest. Spans are aggregated per stage for the summary and
+    optionally written as JSON lines, together with the context (e.g., the
+    paper) they ran in.
+
+    Subprocess CPU is accounted process wide: spans running in parallel
+    threads share it.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.output = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def open(self, fname):
+        """ append the spans to a JSON lines file """
+        self.close()
+        self.output = open(fname, 'a')
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+            self.output = None
+
+    @contextlib.contextmanager
+    def context(self, **info):
+        """ add information to the spans of the current thread (e.g., paper) """
+        previous = getattr(self._local, 'info', {})
+        self._local.info = dict(previous, **info)
+        try:
+            yield
+        finally:
+            self._local.info = previous
+
+    @contextlib.contextmanager
+    def collect(self):
+        """ gather the spans of the current thread in a list """
+        previous = getattr(self._local, 'collected', None)
+        self._local.collected = spans = []
+        try:
+            yield spans
+        finally:
+            self._local.collected = previous
+            if previous is not None:
+                previous.extend(spans)
+
+    @contextlib.contextmanager
+    def span(self, stage, **info):
+        """ Time a stage
+
+        Parameters
+        ----------
+        stage: str
+            name of the stage
+        info: dict
+            information stored with the span
+
+        Returns
+        -------
+        record: dict
+            the span; the code inside it may set record['bytes']
+        """
+        record = dict(getattr(self._local, 'info', {}), **info)
+        record.update(stage=stage, bytes=0)
+        children = _children_cpu()
+        start = time.time()
+        try:
+            yield record
+        except BaseException as error:
+            record['error'] = '{0:s}: {1!s}'.format(type(error).__name__, error)
+            raise
+        finally:
+            record['start'] = start
+            record['elapsed'] = time.time() - start
+            record['child_cpu'] = _children_cpu() - children
+            record['process_peak_rss'] = _peak_rss()
+            collected = getattr(self._local, 'collected', None)
+            if collected is not None:
+                collected.append(record)
+            self._record(record)
+
+    def _record(self, record):
+        with self._lock:
+            stats = self.stages.setdefault(record['stage'], dict(
+                count=0, elapsed=0., longest=0., bytes=0, child_cpu=0., errors=0))
+            stats['count'] += 1
+            stats['elapsed'] += record['elapsed']
+            stats['longest'] = max(stats['longest'], record['elapsed'])
+            stats['bytes'] += record['bytes']
+            stats['child_cpu'] += record['child_cpu']
+            stats['errors'] += int('error' in record)
+            if self.output is not None:
+                import json
+                self.output.write(json.dumps(record, default=str) + '\n')
+                self.output.flush()
+
+    def reset(self):
+        """ forget the stages of the summary (e.g., between the polls of a daemon) """
+        with self._lock:
+            self.stages = {}
+
+    def print_summary(self):
+        """ Per stage breakdown (stages do not nest) and peak memory of the process """
+        print('{0:16s} {1:>6s} {2:>10s} {3:>9s} {4:>9s} {5:>10s} {6:>9s} {7:>6s}'.format(
+            'stage', 'count', 'total [s]', 'mean [s]', 'max [s]', 'MB', 'cpu [s]', 'errors'))
+        for stage, stats in sorted(self.stages.items(), key=lambda item: -item[1]['elapsed']):
+            print('{0:16s} {1:6d} {2:10.2f} {3:9.2f} {4:9.2f} {5:10.2f} {6:9.2f} {7:6d}'.format(
+                stage, stats['count'], stats['elapsed'],
+                stats['elapsed'] / stats['count'], stats['longest'],
+                stats['bytes'] / 1024. ** 2, stats['child_cpu'], stats['errors']))
+        peak = _peak_rss()
+        if peak is not None:
+            print('process peak memory: {0:.1f} MB'.format(peak / 1024. ** 2))
+
+
+# spans of the current run (see Tracer)
+TRACER = Tracer()
+
+
+# messages after which pdflatex output is not worth waiting for
+_LATEX_FATAL = ('! Emergency stop', '! TeX capacity exceeded',
+                'Fatal error occurred', '! ==> Fatal error',
+                "! I can't write on file")
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version(compiler):
+    """ Output of `compiler --version` ('' if it cannot be run) """
+    import subprocess
+    try:
+        output = subprocess.check_output(compiler + ' --version', shell=True,
+                                         stderr=subprocess.STDOUT, timeout=60)
+    except Exception:
+        return ''
+    return output.decode('utf-8', 'replace')
+
+
+class LatexResult(object):
+    """ Outcome of a pdflatex run (see `run_latex`) """
+
+    def __init__(self, command, directory, jobname):
+        self.command = command
+        self.directory = directory
+        self.jobname = jobname
+        self.returncode = None
+        self.pdf = None
+        self.errors = []
+        self.fatal = None
+        self.timed_out = False
+        self.elapsed = 0.
+        self.log = []
+
+    @property
+    def ok(self):
+        """ True if the pdf was completely written """
+        return self.pdf is not None
+
+    def report(self, lines=10):
+        """ status with the first errors, or the end of the log if none """
+        details = self.errors[:lines] or [line.rstrip() for line in self.log[-lines:]]
+        return '\n'.join([repr(self)] + details)
+
+    def __repr__(self):
+        if self.ok:
+            status = 'ok'
+        elif self.timed_out:
+            status = 'timed out'
+        elif self.fatal:
+            status = 'failed: ' + self.fatal
+        else:
+            status = 'failed'
+        txt = "{0:s}: {1:s} ({2:d} errors, {3:0.1f} s)"
+        return txt.format(self.jobname, status, len(self.errors), self.elapsed)
+
+
+def _pdf_complete(fname):
+    """ check that a pdf file ends with its trailer """
+    try:
+        with open(fname, 'rb') as fin:
+            fin.seek(0, os.SEEK_END)
+            fin.seek(max(fin.tell() - 1024, 0))
+            return b'%%EOF' in fin.read()
+    except (IOError, OSError):
+        return False
+
+
+def run_latex(compiler, directory, fname, timeout=None, max_errors=100,
+              verbose=True):
+    """ Run a latex compilation with a time budget
+
+    The output is streamed and the run is stopped at the first fatal error,
+    after `max_errors` errors (if any) or when the timeout is reached.
+
+    Parameters
+    ----------
+    compiler: str
+        compiler command and options
+    directory: str
+        where to run the compilation
+    fname: str
+        tex file to compile
+    timeout: float
+        wall-clock budget in seconds (None for no limit)
+    max_errors: int
+        number of errors after which the run is stopped (None for no limit)
+    verbose: bool
+        set to print the output (it is kept in result.log anyway)
+
+    Returns
+    -------
+    result: LatexResult
+        outcome of the run
+    """
+    import signal
+    import subprocess
+    jobname = os.path.splitext(os.path.basename(fname))[0]
+    command = "{0:s} {1:s}".format(compiler, fname)
+    result = LatexResult(command, directory, jobname)
+    start = time.time()
+    process = subprocess.Popen(command, shell=True, cwd=directory,
+                               stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT,
+                               start_new_session=True)
+
+    def stop():
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+    def expire():
+        result.timed_out = True
+        stop()
+
+    timer = None
+    if timeout:
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+    written = False
+    try:
+        for line in process.stdout:
+            line = line.decode('utf-8', 'replace')
+            result.log.append(line)
+            if verbose:
+                sys.stdout.write(line)
+            if 'Output written on' in line:
+                written = True
+            if line.startswith('!'):
+                result.errors.append(line.strip())
+                if any(line.startswith(msg) for msg in _LATEX_FATAL):
+                    result.fatal = line.strip()
+                    stop()
+                elif max_errors and len(result.errors) >= max_errors:
+                    result.fatal = 'too many errors'
+                    stop()
+        result.returncode = process.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+    result.elapsed = time.time() - start
+    pdf = os.path.join(directory, jobname + '.pdf')
+    if (written and not result.timed_out and result.fatal is None and
+            _pdf_complete(pdf)):
+        result.pdf = pdf
+    if verbose and result.timed_out:
+        color_print('*** Compilation stopped after {0:0.0f} s'.format(result.elapsed), 'red')
+    elif verbose and result.fatal:
+        color_print('*** Compilation stopped: ' + result.fatal, 'red')
+    return result
+
+
 def get_latex_environment(envname, data, onlycontent=True):
     """
     Parse code to find a specific environment content
@@ -463,16 +1306,39 @@ class Figure(object):
     """
     class that attempts to catch figures from tex source input in many formats
     """
-    def __init__(self, code, number=0):
+    def __init__(self, code, number=0, verbose=True):
         self._code = code
+        self.verbose = verbose
         self.info = self._parse()
         self._number = number
         self._n_references = 0
+        # files replaced by a converted version (see DocumentSource.prepare_figures)
+        self.converted = {}
+        # files of the source tree the references resolve to
+        self.index = None
 
     def set_number_of_references(self, number):
         """ tell how many times the figure is cited in the text """
         self._n_references = number
 
+    def to_dict(self):
+        """ parsed figure as json types (see from_dict) """
+        return {'code': self._code, 'number': self._number,
+                'references': self._n_references, 'info': self.info}
+
+    @classmethod
+    def from_dict(cls, data):
+        """ figure from the output of to_dict, without parsing """
+        figure = cls.__new__(cls)
+        figure._code = data['code']
+        figure.info = data['info']
+        figure._number = data['number']
+        figure._n_references = data['references']
+        figure.verbose = True
+        figure.converted = {}
+        figure.index = None
+        return figure
+
     @property
     def number_of_references(self):
         """ how many times the figure is cited in the text """
@@ -489,14 +1355,14 @@ class Figure(object):
             newcode = balanced_braces(self._code[start:end])[0]
             for command in commands:
                 try:
-                    found.append(parse_command(command, newcode))
+                    found.append(parse_command(command, newcode, verbose=self.verbose))
                 except IndexError:
                     pass
         info['subfigures'] = found
 
         for command in commands[:2]:
             try:
-                info[command] = parse_command(command, self._code)
+                info[command] = parse_command(command, self._code, verbose=self.verbose)
             except IndexError:
                 info[command] = None
 
@@ -516,18 +1382,22 @@ class Figure(object):
                     count = self._code.count(command)
                     try:
                         if count > 1:
-                            info[command] = parse_command_multi(command, self._code)
+                            info[command] = parse_command_multi(command, self._code,
+                                                                verbose=self.verbose)
                         else:
-                            info[command] = parse_command(command, self._code)
+                            info[command] = parse_command(command, self._code,
+                                                          verbose=self.verbose)
                     except IndexError:
                         info[command] = None
                 command = 'plottwo'
                 try:
-                    info[command] = parse_command(command, self._code, 2)
+                    info[command] = parse_command(command, self._code, 2,
+                                                  verbose=self.verbose)
                 except IndexError:
                     info[command] = None
         except Exception as error:
-            print(error)
+            if self.verbose:
+                print(error)
             # Catch any issue for now
             for command in commands:
                 info[command] = None
@@ -536,7 +1406,18 @@ class Figure(object):
 
     @property
     def files(self):
-        """ Associated data files """
+        """ Associated data files (converted versions or resolved paths if any) """
+        files = []
+        for fname in self.source_files:
+            path = self.converted.get(fname)
+            if path is None and self.index is not None:
+                path = self.index.resolve(fname)
+            files.append(path or fname)
+        return files
+
+    @property
+    def source_files(self):
+        """ Associated data files as given in the source """
         files = []
         attr = self.info.get('plotone')
         def remove_specials(string):
@@ -565,6 +1446,28 @@ class Figure(object):
                 files.extend(attr)
         return files
 
+    @property
+    def sizes(self):
+        """ (width, height) of each file, None when unknown """
+        sizes = []
+        for fname in self.files:
+            path = None
+            if self.index is not None:
+                path = self.index.path(fname)
+            if path is None:
+                sizes.append(None)
+            else:
+                sizes.append(image_size(path))
+        return sizes
+
+    @property
+    def aspect_ratio(self):
+        """ width over height of the files put side by side, None when unknown """
+        sizes = self.sizes
+        if not sizes or None in sizes:
+            return None
+        return sum(float(width) / height for width, height in sizes)
+
     @property
     def label(self):
         """ figure label """
@@ -584,29 +1487,64 @@ class Figure(object):
 
 
 class Document(object):
-    """ Latex Document structure """
+    """ Latex Document structure
+
+    Parameters
+    ----------
+    data: str
+        latex source
+    large: bool, optional
+        large document mode: the body is extracted from the code each time
+        it is needed instead of being kept. Defaults to sources longer than
+        LARGE_DOCUMENT.
+    verbose: bool
+        set to print the parsing messages
+
+    Only the code without comments is kept: the source is reduced to its
+    hash and arxiver tag.
+    """
 
-    def __init__(self, data):
-        self._data = data
+    def __init__(self, data, large=None, verbose=True):
+        if large is None:
+            large = len(data) > LARGE_DOCUMENT
+        self.large = large
+        self.verbose = verbose
+        self._digest = text_hash(data)
+        self._arxivertag = self._parse_arxivertag(data)
+        if verbose and self._arxivertag is not None:
+            color_print('*** arxiver figure tag', 'green')
         self._code = self._clean_latex_comments(data)
         self._header = get_latex_header(self._code)
-        self._body = get_latex_body(self._code)
-        self._macros = get_latex_macros(self._header)
+        self._cached_body = None
+        self._macros = get_latex_macros(self._header, verbose=verbose)
         self._title = None
         self._abstract = None
         self._authors = None
         self._short_authors = None
         self._structure = None
         self._identifier = None
-        self.figures = [Figure(k, e) for e, k in enumerate(get_latex_figures(self._body), 1)]
+        self.figures = [Figure(k, e, verbose=verbose)
+                        for e, k in enumerate(get_latex_figures(self._body), 1)]
         self.highlight_authors = []
         self.comment = None
         self.date = ''
 
         self._update_figure_references()
 
-    def _clean_latex_comments(self, code):
-        return re.sub(r'(?<!\\)%.*\n', '', code)
+    def _clean_latex_comments(self, code, blocksize=1 << 22):
+        # comments end with their newline: the code is cleaned by blocks of
+        # lines, which bounds the memory of the substitution. A comment on the
+        # last line has no newline and stays: leaving that line out spares
+        # rescanning it to its end from each of its %
+        last = code.rfind('\n') + 1
+        pieces = []
+        start = 0
+        while start < last:
+            end = code.find('\n', min(start + blocksize, last - 1)) + 1
+            pieces.append(_COMMENT_LINE.sub('', code[start:end]))
+            start = end
+        pieces.append(code[last:])
+        return ''.join(pieces)
 
     def _update_figure_references(self):
         """ parse to find cited figures in the text """
@@ -621,20 +1559,97 @@ class Document(object):
                     fig.set_number_of_references(number)
 
     @property
-    def arxivertag(self):
-        """ check for arxiver tag selecting figures """
+    def _body(self):
+        """ document body without comments """
+        body = self._cached_body
+        if body is None:
+            body = get_latex_body(self._code)
+            if not self.large:
+                self._cached_body = body
+        return body
+
+    @staticmethod
+    def _parse_arxivertag(data):
+        """ figures selected by the arxiver tag of the source (None if no tag) """
         tags = None
-        if r"%@arxiver" in self._data:
-            start, end = list(re.compile(r'@arxiver{.*}').finditer(self._data))[0].span()
-            tags = balanced_braces(self._data[start:end])[0]
-            color_print('*** arxiver figure tag', 'green')
+        if r"%@arxiver" in data:
+            # an unclosed tag (or one split over lines) selects nothing: the
+            # figures are then selected automatically
+            spans = _spans_to_last(data, re.escape('@arxiver{'), '}')
+            if spans:
+                start, end = spans[0]
+                tags = (balanced_braces(data[start:end]) or [None])[0]
         return tags
 
+    @property
+    def arxivertag(self):
+        """ check for arxiver tag selecting figures """
+        return self._arxivertag
+
+    @property
+    def digest(self):
+        """ sha1 hex digest of the source """
+        return self._digest
+
+    def to_dict(self):
+        """ Parsed document as json types (see from_dict)
+
+        Returns
+        -------
+        data: dict
+            hash of the source, code, macros, title, authors, abstract,
+            arxiver tag and figures (None for the parts that could not be
+            parsed)
+        """
+        data = {'version': PARSER_VERSION, 'digest': self._digest,
+                'code': self._code, 'macros': self._macros,
+                'figures': [figure.to_dict() for figure in self.figures]}
+        for name in ('title', 'authors', 'abstract', 'arxivertag'):
+            try:
+                data[name] = getattr(self, name)
+            except Exception:
+                data[name] = None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Document from the output of to_dict, without parsing """
+        if data.get('version') != PARSER_VERSION:
+            raise ValueError('Document parsed by another parser version')
+        document = cls.__new__(cls)
+        document.verbose = True
+        document._digest = data['digest']
+        document._code = data['code']
+        document.large = len(document._code) > LARGE_DOCUMENT
+        document._header = get_latex_header(document._code)
+        document._cached_body = None
+        document._macros = data['macros']
+        document._title = data['title']
+        document._abstract = data['abstract']
+        document._authors = data['authors']
+        document._short_authors = None
+        document._structure = None
+        document._identifier = None
+        document._arxivertag = data['arxivertag']
+        document.figures = [Figure.from_dict(figure) for figure in data['figures']]
+        document.highlight_authors = []
+        document.comment = None
+        document.date = ''
+        return document
+
+    @property
+    def graphicspath(self):
+        """ directories of the \\graphicspath command (empty if none) """
+        match = re.compile(r'\\graphicspath\s*\{((?:\s*\{[^{}]*\})+)\s*\}').search(self._header)
+        if match is None:
+            return ()
+        return tuple(path.strip() for path in re.findall(r'\{([^{}]*)\}', match.group(1)))
+
     @property
     def title(self):
         """ Document title """
         if self._title is None:
-            self._title = parse_command('title', self._code)
+            self._title = parse_command('title', self._code, verbose=self.verbose)
         return self._title
 
     @property
@@ -642,7 +1657,7 @@ class Document(object):
         """ Document authors """
         if self._authors in (None, '', 'None'):
             # self._authors = parse_command('author', self._code)
-            self._authors = parse_command_multi('author', self._code)
+            self._authors = parse_command_multi('author', self._code, verbose=self.verbose)
         return self._authors
 
     @property
@@ -662,7 +1677,8 @@ class Document(object):
         if self.highlight_authors:
             incl_authors = []
             for name in self.highlight_authors:
-                print(name)
+                if self.verbose:
+                    print(name)
                 if name != self._authors[0]:
                     incl_authors.append(r'\hl{' + name + r'}')
             authors += '; incl. ' + ', '.join(incl_authors)
@@ -676,9 +1692,11 @@ class Document(object):
             try:
                 try:
                     # AA abstract
-                    self._abstract = '\n'.join(parse_command('abstract', self._body, 5))
+                    self._abstract = '\n'.join(parse_command('abstract', self._body, 5,
+                                                              verbose=self.verbose))
                 except Exception as error:
-                    self._abstract = parse_command('abstract', self._code)
+                    self._abstract = parse_command('abstract', self._code,
+                                                   verbose=self.verbose)
             except IndexError:
                 self._abstract = ' '.join(get_latex_environment('abstract', self._code))
         # Cleaning
@@ -689,17 +1707,18 @@ class Document(object):
         if self._structure is not None:
             return self._structure
 
-        tags = list(re.compile(r'\\([^\s]*)section').finditer(self._body))
+        body = self._body
+        tags = _command_spans(body, 'section')
         try:
-            appendix_start = list(re.compile(r'\\([^\s]*)appendix').finditer(self._body))[0].span()[1]
+            appendix_start = _command_spans(body, 'appendix')[0][1]
         except IndexError:
             appendix_start = len(self._code)
         structure = []
         levels = {r'\section': 0, '\subsection': 1, '\subsubsection': 2}
-        for tag in tags:
-            starts = tag.span()[0]
-            name = parse_command(tag.group(), self._code[starts:])
-            level = levels[tag.group()] + int(starts >= appendix_start)
+        for starts, end in tags:
+            tag = body[starts:end]
+            name = parse_command(tag, self._code[starts:], verbose=self.verbose)
+            level = levels[tag] + int(starts >= appendix_start)
             attr = (level, name, [])
 
             if not structure:
@@ -740,6 +1759,86 @@ class Document(object):
         return txt.format(s=self)
 
 
+class TemplateRenderer(object):
+    """ Template parsed once into literal text and placeholders
+
+    Rendering joins the literal parts and the values in a single pass, so
+    that values are never searched for placeholders themselves.
+    Placeholders without value are left untouched.
+
+    Parameters
+    ----------
+    template: str
+        text with placeholders such as <TITLE>
+    """
+    placeholder = re.compile(r'<([A-Z_]+)>')
+
+    def __init__(self, template):
+        self.segments = []
+        self.names = set()
+        pos = 0
+        for match in self.placeholder.finditer(template):
+            start, end = match.span()
+            self.segments.append((False, template[pos:start]))
+            self.segments.append((True, match.group(1)))
+            self.names.add(match.group(1))
+            pos = end
+        self.segments.append((False, template[pos:]))
+
+    def render(self, values):
+        """ Fill the template
+
+        Parameters
+        ----------
+        values: dict
+            text of each placeholder name
+
+        Returns
+        -------
+        txt: str
+            rendered text
+        """
+        return ''.join([values.get(text, '<' + text + '>') if slot else text
+                        for slot, text in self.segments])
+
+
+# renderers of the templates already parsed, by template text
+_RENDERERS = {}
+
+
+def get_renderer(template):
+    """ Renderer of a template text, parsed on first use """
+    renderer = _RENDERERS.get(template)
+    if renderer is None:
+        renderer = _RENDERERS[template] = TemplateRenderer(template)
+    return renderer
+
+
+class TemplateFile(object):
+    """ Template text read from a file when first needed
+
+    The file is read again if it changed on disk.
+
+    Parameters
+    ----------
+    fname: str
+        template file, relative paths are relative to this package
+    """
+
+    def __init__(self, fname):
+        self.fname = os.path.join(__ROOT__, fname)
+        self._text = None
+        self._mtime = None
+
+    def __get__(self, instance, owner):
+        mtime = os.stat(self.fname).st_mtime
+        if (self._text is None) or (mtime != self._mtime):
+            with open(self.fname, 'r') as fin:
+                self._text = fin.read()
+            self._mtime = mtime
+        return self._text
+
+
 class ExportPDFLatexTemplate(object):
     """ default template """
 
@@ -817,15 +1916,207 @@ class ExportPDFLatexTemplate(object):
     compiler = r"TEXINPUTS='{0:s}/deprecated_tex:' pdflatex ".format(__ROOT__)
     compiler_options = r" -enable-write18 -shell-escape -interaction=nonstopmode "
 
-    def short_authors(self, document):
-        """ Short author """
-        return document.short_authors
+    # budget of a single pdflatex run (seconds) and number of tolerated errors
+    compile_timeout = 300
+    compile_max_errors = 100
 
-    def select_figures(self, document, N=3):
-        """ decides which figures to show """
-        try:
+    # files the template needs next to the postage (see DocumentSource.make_workspace)
+    workspace_files = ()
+
+    # precompiled format of the fixed part of the preamble
+    precompile_preamble = False
+    format_directory = __ROOT__ + '/fmt'
+    # packages that cannot be dumped into a format and are loaded after it
+    format_exclude = ('hyperref',)
+
+    @property
+    def graphics_extensions(self):
+        """ extensions of the \\DeclareGraphicsExtensions of the template, in order """
+        match = re.compile(r'^\\DeclareGraphicsExtensions\{([^}]*)\}', re.M).search(self.template)
+        if match is None:
+            return GRAPHICS_EXTENSIONS
+        return tuple(ext.strip() for ext in match.group(1).split(',') if ext.strip())
+
+    def _split_preamble(self, txt):
+        """ Split a text into the fixed part of the preamble and the rest
+
+        The fixed part ends with the last ``\\usepackage`` line that precedes
+        the first placeholder of the template, so that it never depends on
+        the paper.
+
+        Parameters
+        ----------
+        txt: str
+            template or rendered template
+
+        Returns
+        -------
+        fixed: str
+            fixed part of the preamble (without excluded packages)
+        deferred: str
+            excluded package lines to load after the format
+        rest: str
+            remaining text
+        """
+        placeholder = re.compile(r'<[A-Z_]+>').search(self.template)
+        if placeholder is None:
+            return '', '', txt
+        header = self.template[:placeholder.span()[0]]
+        packages = list(re.compile(r'^\\usepackage.*$', re.M).finditer(header))
+        if not packages:
+            return '', '', txt
+        end = packages[-1].span()[1] + 1
+        if txt[:end] != self.template[:end]:
+            return '', '', txt
+        fixed, deferred = [], []
+        for line in txt[:end].splitlines(True):
+            if (line.startswith(r'\usepackage') and
+                    any('{' + name + '}' in line for name in self.format_exclude)):
+                deferred.append(line)
+            else:
+                fixed.append(line)
+        return ''.join(fixed), ''.join(deferred), txt[end:]
+
+    def make_format(self, verbose=True):
+        """ Dump the fixed part of the preamble into a format file
+
+        The format is named after the hash of the fixed preamble and of the
+        compiler version: any change in the template file or a new pdflatex
+        triggers a new format (a format made by another pdflatex cannot be
+        loaded).
+
+        Parameters
+        ----------
+        verbose: bool
+            set to print the progress messages
+
+        Returns
+        -------
+        name: str
+            format name, None if it could not be generated
+        """
+        fixed, _, _ = self._split_preamble(self.template)
+        if not fixed:
+            return None
+        key = compiler_version(self.compiler) + fixed
+        name = 'postage_' + hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()[:12]
+        fmtfile = os.path.join(self.format_directory, name + '.fmt')
+        with _FORMAT_LOCK:
+            if os.path.isfile(fmtfile):
+                return name
+            if not os.path.isdir(self.format_directory):
+                os.makedirs(self.format_directory)
+            with open(os.path.join(self.format_directory, name + '.tex'), 'w') as out:
+                out.write(fixed)
+                out.write('\\csname endofdump\\endcsname\n')
+                out.write('\\begin{document}\n\\end{document}\n')
+            if verbose:
+                print('*** Dumping preamble format ', name)
+            compiler = ('{0:s} -ini -interaction=nonstopmode -jobname={1:s}'
+                        ' "&pdflatex" mylatexformat.ltx')
+            with TRACER.span('format'):
+                run_latex(compiler.format(self.compiler, name), self.format_directory,
+                          name + '.tex', timeout=self.compile_timeout, verbose=False)
+        if not os.path.isfile(fmtfile):
+            if verbose:
+                color_print('*** Could not dump the preamble format', 'red')
+            return None
+        return name
+
+    def use_format(self, txt, verbose=True):
+        """ Prepare a rendered document for the precompiled preamble
+
+        Parameters
+        ----------
+        txt: str
+            rendered template
+        verbose: bool
+            set to print the progress messages
+
+        Returns
+        -------
+        txt: str
+            document with the end of the dumped part marked
+        compiler: str
+            compiler loading the format (default compiler if not used)
+        """
+        if not self.precompile_preamble:
+            return txt, self.compiler
+        name = self.make_format(verbose=verbose)
+        fixed, deferred, rest = self._split_preamble(txt)
+        if (name is None) or (not fixed):
+            return txt, self.compiler
+        txt = fixed + '\\csname endofdump\\endcsname\n' + deferred + rest
+        compiler = "TEXFORMATS='{0:s}:' {1:s} -fmt={2:s} ".format(
+            self.format_directory, self.compiler, name)
+        return txt, compiler
+
+    def run_compiler(self, compiler, directory, fname, scale=1, verbose=True):
+        """ Compile a document prepared by `use_format`
+
+        A failed run with the precompiled preamble is done once more without
+        it, in case the format cannot be loaded.
+
+        Parameters
+        ----------
+        compiler: str
+            compiler returned by `use_format`
+        directory: str
+            where to run the compilation
+        fname: str
+            tex file to compile
+        scale: int
+            number of postages in the document (scales the time and error budgets)
+        verbose: bool
+            set to print the output of the compilation
+
+        Returns
+        -------
+        result: LatexResult
+            outcome of the last run
+        """
+        result = run_latex("{0:s} {1:s}".format(compiler, self.compiler_options),
+                           directory, fname,
+                           timeout=self.compile_timeout * scale,
+                           max_errors=self.compile_max_errors * scale,
+                           verbose=verbose)
+        if result.ok or result.timed_out or (compiler == self.compiler):
+            return result
+        if verbose:
+            color_print('*** Compiling again without the precompiled preamble', 'red')
+        return run_latex("{0:s} {1:s}".format(self.compiler, self.compiler_options),
+                         directory, fname,
+                         timeout=self.compile_timeout * scale,
+                         max_errors=self.compile_max_errors * scale,
+                         verbose=verbose)
+
+    @property
+    def renderer(self):
+        """ parsed template """
+        return get_renderer(self.template)
+
+    def short_authors(self, document):
+        """ Short author """
+        return document.short_authors
+
+    def qrcode_to_latex(self, document, width=r'0.1\textwidth'):
+        """ QR code linking to the paper drawn by TeX (empty without identifier) """
+        if document._identifier in (None, '', 'None'):
+            return ''
+        identifier = document._identifier.split(':')[-1]
+        return r'\resizebox{{{0:s}}}{{!}}{{{1:s}}}'.format(width, qrcode_to_latex(identifier))
+
+    def format_identifier(self, document):
+        """ Identifier shown in front of the abstract """
+        if document._identifier is not None:
+            return r'\hl{{{0:s}}}'.format(document._identifier) or 'Abstract '
+        return 'Abstract '
+
+    def select_figures(self, document, N=3):
+        """ decides which figures to show """
+        try:
             if document.arxivertag:
-                selected = {fig.files[0]:fig for fig in document.figures if fig.files[0] in document.arxivertag}
+                selected = {fig.source_files[0]:fig for fig in document.figures if fig.source_files[0] in document.arxivertag}
                 return [selected[fname] for fname in document.arxivertag.replace(',', ' ').split()]   ## Keep the same ordering
         except Exception as e:
             raise_or_warn(e)
@@ -848,46 +2139,100 @@ class ExportPDFLatexTemplate(object):
     def apply_to_document(self, document):
         """ generate tex code from document """
 
-        txt = self.template.replace('<MACROS>', "") # document._macros)
-        if document._identifier is not None:
-            txt = txt.replace('<IDENTIFIER>',
-                    r'\hl{{{0:s}}}'.format(document._identifier) or 'Abstract ')
-        else:
-            txt = txt.replace('<IDENTIFIER>', 'Abstract ')
-        txt = txt.replace('<TITLE>', document.title)
-        txt = txt.replace('<AUTHORS>', self.short_authors(document))
-        txt = txt.replace('<ABSTRACT>', document.abstract.replace(r'\n', ' '))
         figures = ''.join([self.figure_to_latex(fig) for fig in
             self.select_figures(document) ])
-        txt = txt.replace('<FIGURES>', figures)
-        txt = txt.replace('<COMMENTS>', document.comment or '')
-        txt = txt.replace('<DATE>', document.date)
-
-        return txt
+        values = {'MACROS': "",   # document._macros
+                  'IDENTIFIER': self.format_identifier(document),
+                  'TITLE': document.title,
+                  'AUTHORS': self.short_authors(document),
+                  'ABSTRACT': document.abstract.replace(r'\n', ' '),
+                  'FIGURES': figures,
+                  'COMMENTS': document.comment or '',
+                  'DATE': document.date}
+        return self.renderer.render(values)
 
 
 class DocumentSource(Document):
     """ Source code class """
 
-    def __init__(self, directory, autoselect=True):
+    # local files copied into the compile workspace
+    workspace_extensions = ('.sty', '.cls', '.clo', '.bst', '.def', '.cfg')
+
+    # figures converted in python before compiling
+    convert_commands = {'.eps': 'epstopdf {input} -o {output}',
+                        '.ps': 'epstopdf {input} -o {output}'}
+
+    def __init__(self, directory, autoselect=True, large=None, verbose=True):
+        self.verbose = verbose
         fnames = glob(directory + '/*.tex')
         if autoselect:
             fname = self._auto_select_main_doc(fnames)
         else:
             fname = self._manual_select_main_doc(fnames)
 
-        with open(fname, 'r', errors="surrogateescape") as finput:
-            data = finput.read()
-            if '\input' and '.tex' in data:
-                for input_command in ['input', 'include']:
-                    data = self._expand_auxilary_files(data, directory=directory,
-                            command=input_command)
-            data = self._parse_of_import_package(data, directory=directory)
-
-        Document.__init__(self, data)
+        data = read_text(fname)
+        for input_command in ['input', 'include']:
+            if '\\' + input_command in data:
+                data = self._expand_auxilary_files(data, directory=directory,
+                        command=input_command)
+        data = self._parse_of_import_package(data, directory=directory)
+
+        Document.__init__(self, data, large=large, verbose=verbose)
         self.fname = fname
         self.directory = directory
+        self.graphics_index = GraphicsIndex(directory, graphicspath=self.graphicspath)
+        for figure in self.figures:
+            figure.index = self.graphics_index
         self.outputname = self.fname[:-len('.tex')] + '_cleaned.tex'
+        self.compile_result = None
+
+    def to_dict(self):
+        """ Parsed source as json types (see from_dict) """
+        data = Document.to_dict(self)
+        data['fname'] = os.path.relpath(self.fname, self.directory)
+        return data
+
+    @classmethod
+    def from_dict(cls, data, directory):
+        """ Source from the output of to_dict, without parsing
+
+        Parameters
+        ----------
+        data: dict
+            output of to_dict
+        directory: str
+            directory holding the extracted source
+        """
+        document = super(DocumentSource, cls).from_dict(data)
+        document.fname = os.path.join(directory, data['fname'])
+        document.directory = directory
+        document.graphics_index = GraphicsIndex(directory, graphicspath=document.graphicspath)
+        for figure in document.figures:
+            figure.index = document.graphics_index
+        document.outputname = document.fname[:-len('.tex')] + '_cleaned.tex'
+        document.compile_result = None
+        return document
+
+    def __copy__(self):
+        """ Copy with its own figures and graphics index
+
+        compile sets the extensions of the template on the index and records
+        the converted figures: copies compiled with different templates (e.g.,
+        one per group) must not share them. The parsed text is shared.
+        """
+        import copy
+        document = self.__class__.__new__(self.__class__)
+        document.__dict__.update(self.__dict__)
+        index = copy.copy(self.graphics_index)
+        index.files = set(index.files)
+        document.graphics_index = index
+        document.figures = []
+        for figure in self.figures:
+            figure = copy.copy(figure)
+            figure.converted = dict(figure.converted)
+            figure.index = index
+            document.figures.append(figure)
+        return document
 
     def _parse_of_import_package(self, data, directory=''):
         if not r'usepackage{import}' in data:
@@ -898,76 +2243,96 @@ class DocumentSource(Document):
             if directory[-1] != '/':
                 directory = directory + '/'
         if len(inputs) > 0:
-            print('*** Found document inclusions using import ')
+            if self.verbose:
+                print('*** Found document inclusions using import ')
             new_data = []
             prev_start, prev_end = 0, 0
             for match in inputs:
                 try:
                     fname = match.group().replace(r'\import', '').strip()
                     fname = fname.replace('{', '').replace('}', '').replace('.tex', '')   # just in case
-                    print('      input command: ', fname)
+                    if self.verbose:
+                        print('      input command: ', fname)
                     try:
-                        with open(directory + fname + '.tex', 'r', errors="surrogateescape") as fauxilary:
-                            auxilary = fauxilary.read()
+                        auxilary = read_text(directory + fname + '.tex')
                     except:
-                        with open(directory + fname, 'r', errors="surrogateescape") as fauxilary:
-                            auxilary = fauxilary.read()
+                        auxilary = read_text(directory + fname)
                     start, end = match.span()
-                    new_data.append(data[prev_end:start])
-                    new_data.append('\n%input from {0:s}\n'.format(fname) + auxilary + '\n')
+                    # pieces joined at once: no intermediate copy of large files
+                    new_data.extend([data[prev_end:start], '\n',
+                                     '\n%input from {0:s}\n'.format(fname),
+                                     auxilary, '\n', '\n'])
                     prev_start, prev_end = start, end
                 except Exception as e:
-                    raise_or_warn(e)
+                    raise_or_warn(e, verbose=self.verbose)
             new_data.append(data[prev_end:])
-            return '\n'.join(new_data)
+            return ''.join(new_data)
         else:
             return data
 
     def _expand_auxilary_files(self, data, directory='', command='input'):
-        # inputs
-        inputs = list(re.compile(r'\\{0:s}.*'.format(command)).finditer(data))
+        """ Replace the \\input (or \\include) commands by the files they read
+
+        Only the command and its argument (braced or a single word) are
+        replaced, the rest of the line is kept. Commands in comments are
+        left as they are. Files are looked up like TeX does: with the .tex
+        extension first.
+        """
+        inputs = _inclusion_pattern(command).finditer(data)
         if len(directory):
             if directory[-1] != '/':
                 directory = directory + '/'
-        if len(inputs) > 0:
-            print('*** Found document inclusions ')
-            new_data = []
-            prev_start, prev_end = 0, 0
-            for match in inputs:
-                try:
-                    fname = match.group().replace(r'\\' + command, '').strip()
-                    fname = fname.replace('{', '').replace('}', '').replace('.tex', '')   # just in case
+        new_data = []
+        prev_end = 0
+        for match in inputs:
+            start, end = match.span()
+            line = data[data.rfind('\n', 0, start) + 1:start]
+            if '%' in line and _COMMENT.search(line):
+                continue
+            try:
+                fname = (match.group(1) or match.group(2)).strip()
+                if fname.endswith('.tex'):
+                    fname = fname[:-len('.tex')]
+                if not new_data and self.verbose:
+                    print('*** Found document inclusions ')
+                if self.verbose:
                     print('      input command: ', fname)
-                    with open(directory + fname + '.tex', 'r', errors="surrogateescape") as fauxilary:
-                        auxilary = fauxilary.read()
-                    start, end = match.span()
-                    new_data.append(data[prev_end:start])
-                    new_data.append('\n%input from {0:s}\n'.format(fname) + auxilary + '\n')
-                    prev_start, prev_end = start, end
-                except Exception as e:
-                    raise_or_warn(e)
-            new_data.append(data[prev_end:])
-            return '\n'.join(new_data)
-        else:
+                if os.path.isfile(directory + fname + '.tex'):
+                    auxilary = read_text(directory + fname + '.tex')
+                else:
+                    auxilary = read_text(directory + fname)
+                # pieces joined at once: no intermediate copy of large files
+                new_data.extend([data[prev_end:start], '\n',
+                                 '\n%input from {0:s}\n'.format(fname),
+                                 auxilary, '\n', '\n'])
+                prev_end = end
+            except Exception as e:
+                raise_or_warn(e, verbose=self.verbose)
+        if not new_data:
             return data
+        new_data.append(data[prev_end:])
+        return ''.join(new_data)
 
     def _auto_select_main_doc(self, fnames):
         if (len(fnames) == 1):
             return fnames[0]
 
-        print('multiple tex files')
+        if self.verbose:
+            print('multiple tex files')
         selected = None
         for e, fname in enumerate(fnames):
             with open(fname, 'r', errors="surrogateescape") as finput:
                 if 'documentclass' in finput.read():
                     selected = e, fname
                     break
-        print("Found main document in: ", selected)
-        if selected is not None:
+        if self.verbose:
+            print("Found main document in: ", selected)
+        if selected is not None and self.verbose:
             print("Found main document in: ", selected[1])
             print(e, fname)
         if selected is not None:
-            print("Found main document in: ", selected[1])
+            if self.verbose:
+                print("Found main document in: ", selected[1])
             return selected[1]
         else:
             print('Could not locate the main document automatically. Little help please!')
@@ -984,154 +2349,584 @@ class DocumentSource(Document):
         return '''Paper in {0:s}, \n\t{1:s}'''.format(self.fname,
                 Document.__repr__(self))
 
-    def compile(self, template=None):
+    def prepare_figures(self, figures, max_workers=4, verbose=True):
+        """ Convert the figures that pdflatex cannot include directly
 
-        if template is None:
-            template = ExportPDFLatexTemplate()
+        Conversions are cached by the hash of the file contents and run in
+        parallel. Converted files follow the naming of the
+        \\DeclareGraphicsRule of the templates.
 
-        with open(self.outputname, 'w') as out:
-            data = template.apply_to_document(self)
-            out.write(data.encode('utf-8', 'surrogateescape').decode('utf-8', 'replace'))
+        Parameters
+        ----------
+        figures: seq(Figure)
+            figures to prepare (e.g., the selected ones)
+        max_workers: int
+            number of conversions running at the same time
+        verbose: bool
+            set to print the conversions and their failures
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        jobs = {}
+        for figure in figures:
+            for fname in figure.source_files:
+                path = self.graphics_index.resolve(fname)
+                if path is None:
+                    continue
+                root, ext = os.path.splitext(path)
+                if ext.lower() in self.convert_commands:
+                    output = '{0:s}-{1:s}-converted-to.pdf'.format(root, ext[1:])
+                    jobs[fname] = (path, output, self.convert_commands[ext.lower()])
+
+        def convert(item):
+            fname, (path, output, command) = item
+            target = convert_figure(os.path.join(self.directory, path),
+                                    os.path.join(self.directory, output),
+                                    command, verbose=verbose)
+            return fname, output, target
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(convert, jobs.items()))
+        for fname, output, target in results:
+            if target is None:
+                continue
+            self.graphics_index.add(output)
+            for figure in figures:
+                if fname in figure.source_files:
+                    figure.converted[fname] = output
+
+    def optimize_figures(self, figures, dpi=200, max_width=20.,
+                         max_vector_size=2 * 1024 ** 2, max_workers=4,
+                         verbose=True):
+        """ Bound the cost of embedding the figures in the postage
+
+        Raster images larger than the postage needs are downsampled and
+        heavy vector figures are rasterized. The complexity of a vector
+        figure is estimated from its file size. Results are cached like
+        the conversions.
 
-        # compile source to get aux data if necessary
-        compiler_command = "cd {0:s}; {1:s} {2:s} ".format(self.directory,
-                template.compiler, template.compiler_options)
-        if not os.path.isfile(self.fname.replace('.tex', '.aux')):
-            outputname = self.fname.split('/')[-1]
-            subprocess.call(compiler_command + outputname, shell=True)
+        Parameters
+        ----------
+        figures: seq(Figure)
+            figures to optimize (e.g., the selected ones)
+        dpi: int
+            target resolution on the postage
+        max_width: float
+            largest size of a figure on the postage in cm
+        max_vector_size: int
+            vector figures larger than this (in bytes) are rasterized
+        max_workers: int
+            number of conversions running at the same time
+        verbose: bool
+            set to print the optimizations and their failures
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        max_pixels = int(max_width / 2.54 * dpi)
+        jobs = {}
+        for figure in figures:
+            for fname in figure.source_files:
+                path = figure.converted.get(fname)
+                if path is None:
+                    path = self.graphics_index.resolve(fname)
+                if path is None:
+                    continue
+                fullpath = os.path.join(self.directory, path)
+                root, ext = os.path.splitext(path)
+                ext = ext.lower()
+                if ext in ('.png', '.jpg', '.jpeg'):
+                    try:
+                        from PIL import Image
+                        size = max(Image.open(fullpath).size)
+                    except Exception as error:
+                        raise_or_warn(error, verbose=verbose)
+                        continue
+                    if size <= max_pixels:
+                        continue
+                    command = functools.partial(downscale_image,
+                                                max_pixels=max_pixels)
+                    key = 'downscale {0:d}'.format(max_pixels)
+                elif ext in ('.pdf', '.eps', '.ps'):
+                    if os.path.getsize(fullpath) <= max_vector_size:
+                        continue
+                    command = functools.partial(rasterize_figure, dpi=dpi)
+                    key = 'rasterize {0:d}'.format(dpi)
+                    ext = '.png'
+                else:
+                    continue
+                output = root + '-optimized' + ext
+                jobs[fname] = (fullpath, output, command, key)
 
-        # get the references compiled
+        def optimize(item):
+            fname, (path, output, command, key) = item
+            if verbose:
+                print('*** Optimizing figure ', fname)
+            target = convert_figure(path, os.path.join(self.directory, output),
+                                    command, key=key, verbose=verbose)
+            return fname, output, target
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(optimize, jobs.items()))
+        for fname, output, target in results:
+            if target is None:
+                continue
+            self.graphics_index.add(output)
+            for figure in figures:
+                if fname in figure.source_files:
+                    figure.converted[fname] = output
+
+    def make_workspace(self, figures, extra_files=(), root=None):
+        """ Copy only what the postage needs into a new directory
+
+        The workspace holds the generated tex file, its aux file, the
+        selected figures (converted versions if any), the local
+        packages and classes of the paper and the extra files.
+
+        Parameters
+        ----------
+        figures: seq(Figure)
+            selected figures
+        extra_files: seq(str)
+            other files relative to the source directory
+        root: str
+            where to create the workspace (default: /dev/shm if available)
+
+        Returns
+        -------
+        workspace: str
+            path of the workspace
+        """
+        import tempfile
+        if root is None and os.access('/dev/shm', os.W_OK):
+            root = '/dev/shm'
+        workspace = tempfile.mkdtemp(prefix='postage_', dir=root)
+
+        fnames = [self.outputname, self.outputname.replace('.tex', '.aux')]
+        for figure in figures:
+            for fname in figure.files:
+                path = self.graphics_index.path(fname)
+                if path is not None:
+                    fnames.append(path)
+        for fname in sorted(self.graphics_index.files):
+            if os.path.splitext(fname)[1] in self.workspace_extensions:
+                fnames.append(os.path.join(self.directory, fname))
+        fnames.extend(os.path.join(self.directory, fname) for fname in extra_files)
+
+        for fname in fnames:
+            relpath = os.path.relpath(fname, self.directory)
+            if relpath.startswith('..') or not os.path.isfile(fname):
+                continue
+            target = os.path.join(workspace, relpath)
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+            shutil.copy2(fname, target)
+        return workspace
+
+    def get_references(self, template, verbose=True):
+        """ Citations and labels of the paper from its aux file
+
+        The paper is compiled first if the aux file does not exist.
+
+        Parameters
+        ----------
+        template: ExportPDFLatexTemplate
+            provides the compiler
+        verbose: bool
+            set to print the output of the compilation
+
+        Returns
+        -------
+        lines: list(str)
+            aux lines relevant to the postage
+        """
+        # compile source to get aux data if necessary
+        # (aux files are cached by the hash of the source)
         input_aux = self.fname.replace('.tex', '.aux')
-        output_aux = self.outputname.replace('.tex', '.aux')
+        key = hashlib.sha1((self.digest + template.compiler).encode(
+            'utf-8', 'surrogateescape')).hexdigest()
+        cached = '{0:s}/aux/{1:s}.aux'.format(__CACHE__, key)
+        if not os.path.isfile(input_aux) and os.path.isfile(cached):
+            shutil.copy2(cached, input_aux)
+        if not os.path.isfile(input_aux):
+            compiler = "{0:s} {1:s}".format(template.compiler, template.compiler_options)
+            # harmless errors are common in full papers: only fatal errors
+            # and the timeout stop this run
+            with TRACER.span('paper compile'):
+                result = run_latex(compiler, self.directory, self.fname.split('/')[-1],
+                                   timeout=template.compile_timeout,
+                                   max_errors=None, verbose=verbose)
+            # the aux file of a stopped run is truncated
+            if (result.timed_out or result.fatal) and os.path.isfile(input_aux):
+                os.remove(input_aux)
+            # only cache the aux file of complete runs
+            if result.ok and os.path.isfile(input_aux):
+                os.makedirs(os.path.dirname(cached), exist_ok=True)
+                shutil.copy2(input_aux, cached)
+
+        lines = []
         try:
-            with open(output_aux, 'w+') as fout:
-                with open(input_aux, 'r', errors="surrogateescape") as fin:
-                    for line in fin:
-                        if (('cite' in line) or ('citation' in line) or
-                                ('label' in line) or ('toc' in line)):
-                            fout.write(line.encode('utf-8', 'surrogateescape').decode('utf-8', 'replace'))
+            with open(input_aux, 'r', errors="surrogateescape") as fin:
+                for line in fin:
+                    if (('cite' in line) or ('citation' in line) or
+                            ('label' in line) or ('toc' in line)):
+                        lines.append(line.encode('utf-8', 'surrogateescape').decode('utf-8', 'replace'))
         except:
             pass
+        return lines
+
+    def fingerprint(self, template, data, references, figures):
+        """ Identify all the inputs of a postage compilation
+
+        Parameters
+        ----------
+        template: ExportPDFLatexTemplate
+            template used
+        data: str
+            rendered template
+        references: seq(str)
+            aux lines
+        figures: seq(Figure)
+            selected figures
+
+        Returns
+        -------
+        fingerprint: str
+            sha1 hex digest
+        """
+        sha = hashlib.sha1()
+        cls = type(template)
+        for item in (cls.__module__ + '.' + cls.__name__, template.compiler,
+                     template.compiler_options, data, ''.join(references)):
+            sha.update(item.encode('utf-8', 'surrogateescape'))
+        fnames = [fname for figure in figures for fname in figure.files]
+        fnames.extend(template.workspace_files)
+        for fname in fnames:
+            path = self.graphics_index.resolve(fname)
+            if path is not None:
+                sha.update(path.encode('utf-8', 'surrogateescape'))
+                sha.update(file_hash(os.path.join(self.directory, path)).encode('utf8'))
+        return sha.hexdigest()
+
+    def compile(self, template=None, prepare_figures=True,
+                optimize_figures=False, workspace=False, cache=True,
+                verbose=True):
+        """ Generate the postage pdf
+
+        Parameters
+        ----------
+        template: ExportPDFLatexTemplate
+            template to use
+        prepare_figures: bool
+            convert figures in python before compiling
+        optimize_figures: bool
+            downsample or rasterize heavy figures before compiling
+        workspace: bool
+            compile in a minimal temporary directory
+        cache: bool
+            reuse the pdf of a previous compilation with identical inputs
+        verbose: bool
+            set to print the output of the compilations (it is kept in
+            compile_result.log anyway)
+
+        Returns
+        -------
+        pdf: str
+            generated pdf, None if the compilation failed
+        """
+        if template is None:
+            template = ExportPDFLatexTemplate()
+
+        self.graphics_index.extensions = template.graphics_extensions
+        selected = template.select_figures(self)
+        if prepare_figures:
+            with TRACER.span('figures'):
+                self.prepare_figures(selected, verbose=verbose)
+        if optimize_figures:
+            with TRACER.span('optimize figures'):
+                self.optimize_figures(selected, verbose=verbose)
+
+        with open(self.outputname, 'w') as out:
+            with TRACER.span('render'):
+                data = template.apply_to_document(self)
+            data, postage_compiler = template.use_format(data, verbose=verbose)
+            data = data.encode('utf-8', 'surrogateescape').decode('utf-8', 'replace')
+            out.write(data)
+
+        # get the references compiled
+        output_aux = self.outputname.replace('.tex', '.aux')
+        references = self.get_references(template, verbose=verbose)
+        with open(output_aux, 'w+') as fout:
+            for line in references:
+                fout.write(line)
+
+        pdf = self.outputname.replace('.tex', '.pdf')
+        if cache:
+            fingerprint = self.fingerprint(template, data, references, selected)
+            cached = '{0:s}/postages/{1:s}.pdf'.format(__CACHE__, fingerprint)
+            if os.path.isfile(cached):
+                if verbose:
+                    color_print('*** Inputs unchanged, using ' + cached, 'green')
+                shutil.copy2(cached, pdf)
+                result = LatexResult('cached', self.directory,
+                                     os.path.splitext(os.path.basename(pdf))[0])
+                result.pdf = pdf
+                result.log = ['Inputs unchanged, using {0:s}\n'.format(cached)]
+                self.compile_result = result
+                return pdf
 
         # compile output
         outputname = self.outputname.split('/')[-1]
-        subprocess.call(compiler_command + outputname, shell=True)
+        directory = self.directory
+        if workspace:
+            directory = self.make_workspace(selected,
+                    extra_files=template.workspace_files)
+        with TRACER.span('postage compile'):
+            result = template.run_compiler(postage_compiler, directory, outputname,
+                                           verbose=verbose)
+        self.compile_result = result
+
+        if workspace:
+            pdfname = outputname.replace('.tex', '.pdf')
+            if result.ok:
+                for fname in (pdfname, outputname.replace('.tex', '.log')):
+                    if os.path.isfile(os.path.join(directory, fname)):
+                        shutil.copy2(os.path.join(directory, fname),
+                                     os.path.join(self.directory, fname))
+                shutil.rmtree(directory)
+            elif verbose:
+                color_print('*** Compilation failed, workspace kept in ' + directory, 'red')
 
+        if not result.ok:
+            return None
+        if cache:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            shutil.copy2(pdf, cached)
+        return pdf
 
-class ArxivAbstractHTMLParser(HTMLParser):
-    """ generates a list of Paper items by parsing the Arxiv new page """
 
-    def __init__(self, *args, **kwargs):
-        HTMLParser.__init__(self, *args, **kwargs)
-        self.current_paper = None
-        self._paper_item = False
-        self._title_tag = False
-        self._author_tag = False
-        self._abstract_tag = False
-        self._comment_tag = False
-        self.title = None
-        self.comment = None
-        self.date = None
-        self.authors = []
-
-    def handle_starttag(self, tag, attrs):
-        if tag == 'h1':
-            self._title_tag = True
-        if (tag == 'a') & (len(attrs) > 0):
-            if "searchtype=author" in attrs[0][1]:
-            # if '/find/astro-ph/1/au:' in attrs[0][1]:
-                self._author_tag = True
-        if tag == 'blockquote':
-            self._abstract_tag = True
+_REFERENCE_COMMANDS = re.compile(
+    r'(\\(?:[a-zA-Z]*cite[a-zA-Z]*|ref|eqref|autoref|pageref|cref|Cref|'
+    r'label|newlabel|citation)\*?(?:\[[^\]]*\]){0,2}\{)([^}]*)\}')
+
+
+def prefix_references(text, prefix):
+    """ Prefix citation and label keys to keep them apart in a booklet
+
+    Parameters
+    ----------
+    text: str
+        latex code or aux content
+    prefix: str
+        prefix added to every key
+
+    Returns
+    -------
+    text: str
+        code with the keys renamed
+    """
+    def rename(match):
+        keys = ','.join(prefix + key.strip() for key in match.group(2).split(','))
+        return match.group(1) + keys + '}'
+    return _REFERENCE_COMMANDS.sub(rename, text)
+
+
+def _booklet_graphicspath(macros, directory):
+    """ Remove \\graphicspath from the macros of a paper
+
+    Returns the macros and the paper's graphics paths made absolute: the
+    paper directory followed by its own \\graphicspath entries.
+    """
+    directory = os.path.abspath(directory)
+    paths = [directory + '/']
+    for line in re.compile(r'\\graphicspath.*').findall(macros):
+        for path in re.findall(r'\{([^{}]*)\}', ''.join(balanced_braces(line)[:1])):
+            paths.append(os.path.join(directory, path.strip()).rstrip('/') + '/')
+    macros = re.sub(r'\\graphicspath.*', '', macros)
+    return macros, ''.join('{' + path + '}' for path in paths)
+
+
+def compile_booklet(documents, template=None, output=None, split=False,
+                    verbose=True):
+    """ Render many postages into one document compiled with a single run
+
+    Each paper is rendered with `template.apply_to_document` and its body
+    is wrapped in a group with its own macros, graphics path and
+    identifier. Citation and label keys are prefixed per paper.
+
+    Parameters
+    ----------
+    documents: seq(DocumentSource)
+        papers to include, each in its own directory
+    template: ExportPDFLatexTemplate
+        template of the postages
+    output: str
+        booklet pdf file (default: __ROOT__/booklet.pdf)
+    split: bool
+        set to also write one pdf per paper next to the booklet
+    verbose: bool
+        set to print the output of the compilation
+
+    Returns
+    -------
+    outputs: list(str)
+        the booklet followed by the per-paper pdfs if split
+    """
+    if template is None:
+        template = ExportPDFLatexTemplate()
+    if output is None:
+        output = __ROOT__ + '/booklet.pdf'
+    output = os.path.abspath(output)
+    directory = os.path.dirname(output)
+    jobname = os.path.splitext(os.path.basename(output))[0]
+
+    begin, end = r'\begin{document}', r'\end{document}'
+    preamble = template.template[:template.template.find(begin)]
+    preamble = TemplateRenderer(preamble).render(
+        {'MACROS': '', 'IDENTIFIER': r'\postageidentifier'})
+
+    pages = [preamble, r'\providecommand{\postageidentifier}{}' + '\n', begin + '\n']
+    references = []
+    for number, document in enumerate(documents, 1):
+        prefix = 'p{0:d}:'.format(number)
+        document.prepare_figures(template.select_figures(document), verbose=verbose)
+        txt = template.apply_to_document(document)
+        body = txt[txt.find(begin) + len(begin):txt.rfind(end)]
+        macros = document._macros.replace(r'\gdef', r'\def')
+        # the paper's own \graphicspath is relative to its directory
+        macros, paths = _booklet_graphicspath(macros, document.directory)
+        pages.append('% --- {0:s}\n'.format(str(document._identifier)))
+        pages.append('\\begingroup\n')
+        pages.append('\\def\\postageidentifier{{{0:s}}}\n'.format(template.format_identifier(document)))
+        pages.append(macros + '\n')
+        pages.append('\\graphicspath{{{0:s}}}\n'.format(paths))
+        pages.append('\\label{{booklet:{0:d}:start}}\n'.format(number))
+        pages.append(prefix_references(body, prefix))
+        pages.append('\n\\label{{booklet:{0:d}:end}}\n'.format(number))
+        pages.append('\\endgroup\n\\clearpage\n')
+        references.extend(prefix_references(line, prefix)
+                          for line in document.get_references(template, verbose=verbose))
+    pages.append(end + '\n')
+
+    data, compiler = template.use_format(''.join(pages), verbose=verbose)
+    with open(os.path.join(directory, jobname + '.tex'), 'w') as out:
+        out.write(data.encode('utf-8', 'surrogateescape').decode('utf-8', 'replace'))
+    with open(os.path.join(directory, jobname + '.aux'), 'w') as out:
+        out.writelines(references)
+
+    with TRACER.span('booklet compile'):
+        result = template.run_compiler(compiler, directory, jobname + '.tex',
+                                       scale=len(documents), verbose=verbose)
+    if not result.ok:
+        raise RuntimeError('Booklet compilation failed -- ' + str(result))
+    outputs = [output]
+    if not split:
+        return outputs
+
+    # page ranges of each paper from the labels
+    import subprocess
+    with open(os.path.join(directory, jobname + '.aux'), 'r', errors="surrogateescape") as fin:
+        labels = dict(((int(num), where), int(page)) for num, where, page in
+                      re.findall(r'\\newlabel\{booklet:(\d+):(start|end)\}\{\{[^{}]*\}\{(\d+)\}', fin.read()))
+    for number, document in enumerate(documents, 1):
         try:
-            if tag == 'td' and 'tablecell comments' in attrs[0][1]:
-                self._comment_tag = True
-        except IndexError:
-            pass
+            first, last = labels[number, 'start'], labels[number, 'end']
+        except KeyError:
+            if verbose:
+                color_print('*** No pages found for ' + str(document._identifier), 'red')
+            continue
+        name = str(document._identifier or 'postage_{0:d}'.format(number))
+        name = os.path.join(directory, name.split(':')[-1].replace('/', '_') + '.pdf')
+        command = ('gs -q -dSAFER -dBATCH -dNOPAUSE -sDEVICE=pdfwrite '
+                   '-dFirstPage={0:d} -dLastPage={1:d} -sOutputFile="{2:s}" "{3:s}"')
+        subprocess.call(command.format(first, last, name, output), shell=True)
+        outputs.append(name)
+    return outputs
+
+
+def __getattr__(name):
+    """ Lazy access to the html parsers (see html_parsers) """
+    if name in ('ArxivAbstractHTMLParser', 'ArxivListHTMLParser'):
+        import html_parsers
+        return getattr(html_parsers, name)
+    raise AttributeError("module {0!r} has no attribute {1!r}".format(__name__, name))
+
 
-    def handle_endtag(self, tag):
-        if tag == 'h1':
-            self._title_tag = False
-        if tag == 'a':
-            self._author_tag = False
-        if tag == 'blockquote':
-            self._abstract_tag = False
-
-    def handle_data(self, data):
-        if self._title_tag and ('Title:' not in data):
-            self.title = data.replace('\n', ' ').strip()
-        if self._author_tag:
-            self.authors.append(data)
-        if self._abstract_tag:
-            self.abstract = data.strip()
-        if self._comment_tag:
-            # self.comment = re.escape(data.strip())
-            self.comment = tex_escape(data.strip())
-            # self.comment = data.strip()
-            self._comment_tag = False
-        if 'Submitted on' in data:
-            self.date = data.strip()
-
-
-class ArxivListHTMLParser(HTMLParser):
-    """ generates a list of Paper items by parsing the Arxiv new page """
-
-    def __init__(self, *args, **kwargs):
-        skip_replacements = kwargs.pop('skip_replacements', False)
-        HTMLParser.__init__(self, *args, **kwargs)
-        self.papers = []
-        self.current_paper = None
-        self._paper_item = False
-        self._title_tag = False
-        self._author_tag = False
-        self.skip_replacements = skip_replacements
-        self._skip = False
-        self._date = kwargs.pop('appearedon', '')
-
-    def handle_starttag(self, tag, attrs):
-        # paper starts with a dt tag
-        if (tag in ('dt') and not self._skip):
-            if self.current_paper:
-                self.papers.append(self.current_paper)
-            self._paper_item = True
-            self.current_paper = ArXivPaper(appearedon=self._date)
-
-    def handle_endtag(self, tag):
-        # paper ends with a /dd tag
-        if tag in ('dd'):
-            self._paper_item = False
-        if tag in ('div',) and self._author_tag:
-            self._author_tag = False
-        if tag in ('div',) and self._title_tag:
-            self._title_tag = False
-
-    def handle_data(self, data):
-        if data.strip() in (None, "", ','):
-            return
-        if 'replacements for' in data.lower():
-            self._skip = (True & self.skip_replacements)
-        if 'new submissions for' in data.lower():
-            self._date = data.lower().replace('new submissions for', '')
-        if self._paper_item:
-            if 'arXiv:' in data:
-                self.current_paper.identifier = data
-            if self._title_tag:
-                self.current_paper.title = data.replace('\n', '')
-                self._title_tag = False
-            if self._author_tag:
-                self.current_paper._authors.append(data.replace('\n', ''))
-                self._title_tag = False
-            if 'Title:' in data:
-                self._title_tag = True
-            if 'Authors:' in data:
-                self._author_tag = True
+def eprint_filename(identifier):
+    """ where the e-print of a paper is kept """
+    identifier = identifier.split(':')[-1].replace('/', '_')
+    return '{0:s}/eprints/{1:s}.tar.gz'.format(__CACHE__, identifier)
+
+
+def load_document_source(directory, key=None, autoselect=True, verbose=True):
+    """ DocumentSource of a directory, reusing a previous parsing if possible
+
+    Parsed sources are cached by the given key (e.g., the hash of the
+    e-print) and the parser version.
+
+    Parameters
+    ----------
+    directory: str
+        extracted source
+    key: str
+        identifies the content of the directory (no caching if None)
+    autoselect: bool
+        select the main tex file automatically (no caching otherwise)
+    verbose: bool
+        set to print the parsing messages
+
+    Returns
+    -------
+    document: DocumentSource
+        parsed source
+    """
+    if key is None or not autoselect:
+        return DocumentSource(directory, autoselect=autoselect, verbose=verbose)
+    import json
+    cached = '{0:s}/documents/{1:s}-{2:d}.json'.format(__CACHE__, key, PARSER_VERSION)
+    if os.path.isfile(cached):
+        try:
+            with open(cached, 'r', errors='surrogateescape') as fin:
+                document = DocumentSource.from_dict(json.load(fin), directory)
+            document.verbose = verbose
+            if verbose:
+                color_print('*** Using the parsed source ' + cached, 'green')
+            return document
+        except Exception as error:
+            raise_or_warn(error, verbose=verbose)
+    document = DocumentSource(directory, autoselect=autoselect, verbose=verbose)
+    os.makedirs(os.path.dirname(cached), exist_ok=True)
+    with open(cached + '.part', 'w', errors='surrogateescape') as fout:
+        json.dump(document.to_dict(), fout)
+    os.replace(cached + '.part', cached)
+    return document
+
+
+class _CountingReader(object):
+    """ file object counting, hashing and optionally copying the bytes read through it """
+
+    def __init__(self, fileobj, copy=None):
+        self.fileobj = fileobj
+        self.copy = copy
+        self.bytes = 0
+        self.sha = hashlib.sha1()
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.bytes += len(data)
+        self.sha.update(data)
+        if self.copy is not None:
+            self.copy.write(data)
+        return data
+
+    def drain(self):
+        """ read what the consumer left (e.g., archive padding) """
+        while self.read(2 ** 16):
+            pass
 
 
 class ArXivPaper(object):
     """ Class that handles the interface to Arxiv website paper abstract """
 
-    source = "https://arxiv.org/e-print/{identifier}"
-    abstract = "https://arxiv.org/abs/{identifier}"
+    source = "{base:s}/e-print/{identifier}"
+    abstract = "{base:s}/abs/{identifier}"
 
     def __init__(self, identifier="", highlight_authors=None, appearedon=None):
         """ Initialize the data """
@@ -1182,45 +2977,129 @@ class ArXivPaper(object):
         txt = """[{s.identifier:s}]: {s.title:s}\n\t{s.authors:s}"""
         return txt.format(s=self)
 
-    def retrieve_document_source(self, directory=None, autoselect=True):
-        where = ArXivPaper.source.format(identifier=self.identifier.split(':')[-1])
-        tar = tarfile.open(mode='r|gz', fileobj=urlopen(where))
+    def retrieve_document_source(self, directory=None, autoselect=True, verbose=True):
+        import tarfile
+        where = ArXivPaper.source.format(base=ARXIV_URL, identifier=self.identifier.split(':')[-1])
         if directory is None:
-            return tar
+            return tarfile.open(mode='r|gz', fileobj=open_url(where))
         else:
-            if os.path.isdir(directory):
-                shutil.rmtree(directory)
-            print("extracting tarball...")
-            tar.extractall(directory)
-            document = DocumentSource(directory, autoselect=autoselect)
+            # the e-print is kept to extract it again without downloading
+            eprint = eprint_filename(self.identifier)
+            os.makedirs(os.path.dirname(eprint), exist_ok=True)
+            with TRACER.span('eprint', url=where) as span:
+                with open(eprint + '.part', 'wb') as copy:
+                    stream = _CountingReader(open_url(where), copy=copy)
+                    tar = tarfile.open(mode='r|gz', fileobj=stream)
+                    if os.path.isdir(directory):
+                        shutil.rmtree(directory)
+                    if verbose:
+                        print("extracting tarball...")
+                    tar.extractall(directory)
+                    stream.drain()
+                os.replace(eprint + '.part', eprint)
+                span['bytes'] = stream.bytes
+            with TRACER.span('parse'):
+                document = load_document_source(directory, key=stream.sha.hexdigest(),
+                                                autoselect=autoselect, verbose=verbose)
             self.get_abstract()
-            try:
-                document.authors
-            except Exception as error:
-                raise_or_warn(error)
-                document._authors = self.authors
-            try:
-                document.abstract
-            except Exception as error:
-                raise_or_warn(error)
-                document._abstract = self.abstract
-            document._short_authors = self.short_authors
+            self.save_metadata()
+            return self._fill_document(document, verbose=verbose)
+
+    def load_document_source(self, directory, autoselect=True, verbose=True):
+        """ Extract and parse the e-print kept by retrieve_document_source
+
+        Nothing is downloaded (see from_local).
+
+        Parameters
+        ----------
+        directory: str
+            where to extract the source
+        autoselect: bool
+            select the main tex file automatically
+        verbose: bool
+            set to print the parsing messages
+
+        Returns
+        -------
+        document: DocumentSource
+            parsed source with the paper information
+        """
+        import tarfile
+        eprint = eprint_filename(self.identifier)
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        with TRACER.span('eprint', url=eprint) as span:
+            with tarfile.open(eprint, 'r:gz') as tar:
+                tar.extractall(directory)
+            span['bytes'] = os.path.getsize(eprint)
+        with TRACER.span('parse'):
+            document = load_document_source(directory, key=file_hash(eprint),
+                                            autoselect=autoselect, verbose=verbose)
+        return self._fill_document(document, verbose=verbose)
+
+    def _fill_document(self, document, verbose=True):
+        """ complete a parsed source with the information of the abstract page """
+        try:
+            document.authors
+        except Exception as error:
+            raise_or_warn(error, verbose=verbose)
             document._authors = self.authors
-            document._identifier = self.identifier
-            document.comment = None
-            if self.comment:
-                document.comment = self.comment.replace('\\ ', ' ')
-            if self.appearedon in (None, '', 'None'):
-                document.date = self.date
-            else:
-                document.date = 'Appeared on ' + self.appearedon
-            return document
+        try:
+            document.abstract
+        except Exception as error:
+            raise_or_warn(error, verbose=verbose)
+            document._abstract = self.abstract
+        document._short_authors = self.short_authors
+        document._authors = self.authors
+        document._identifier = self.identifier
+        document.comment = None
+        if self.comment:
+            document.comment = self.comment.replace('\\ ', ' ')
+        if self.appearedon in (None, '', 'None'):
+            document.date = self.date
+        else:
+            document.date = 'Appeared on ' + self.appearedon
+        return document
+
+    def save_metadata(self):
+        """ keep the abstract page information next to the e-print """
+        import json
+        import datetime
+        data = {'identifier': self.identifier, 'title': self.title,
+                'authors': self._authors, 'abstract': self.abstract,
+                'comment': self.comment, 'date': self.date,
+                'appearedon': self.appearedon,
+                # day of the retrieval (see local_identifiers)
+                'day': datetime.date.today().isoformat()}
+        fname = eprint_filename(self.identifier).replace('.tar.gz', '.json')
+        with open(fname, 'w') as fout:
+            json.dump(data, fout)
+
+    @classmethod
+    def from_local(cls, identifier):
+        """ Paper from the information kept by retrieve_document_source
+
+        Nothing is downloaded, see load_document_source for the source.
+        """
+        import json
+        with open(eprint_filename(identifier).replace('.tar.gz', '.json')) as fin:
+            data = json.load(fin)
+        paper = cls(appearedon=data['appearedon'])
+        paper.identifier = data['identifier']
+        paper.title = data['title']
+        paper._authors = data['authors']
+        paper.abstract = data['abstract']
+        paper.comment = data['comment']
+        paper.date = data['date']
+        return paper
 
     def get_abstract(self):
-        where = ArXivPaper.abstract.format(identifier=self.identifier.split(':')[-1])
-        html = urlopen(where).read().decode('utf-8')
-        parser = ArxivAbstractHTMLParser()
-        parser.feed(html)
+        from html_parsers import ArxivAbstractHTMLParser
+        where = ArXivPaper.abstract.format(base=ARXIV_URL, identifier=self.identifier.split(':')[-1])
+        html = fetch_url(where)
+        with TRACER.span('abstract parse'):
+            parser = ArxivAbstractHTMLParser()
+            parser.feed(html)
         self.title = parser.title
         self._authors = parser.authors
         self.abstract = parser.abstract
@@ -1230,38 +3109,489 @@ class ArXivPaper(object):
 
     def make_postage(self, template=None):
         print("Generating postage")
-        self.get_abstract()
         s = self.retrieve_document_source(__ROOT__ + '/tmp')
-        s.compile(template=template)
+        pdf = s.compile(template=template)
+        if pdf is None:
+            raise RuntimeError('Compilation failed -- ' + str(s.compile_result))
         identifier = self.identifier.split(':')[-1]
-        name = s.outputname.replace('.tex', '.pdf').split('/')[-1]
-        shutil.copy2(__ROOT__ + '/tmp/' + name, identifier + '.pdf')
-        shutil.copy2(__ROOT__ + '/' + name, identifier + '.pdf')
+        shutil.copy2(pdf, identifier + '.pdf')
         print("PDF postage:", identifier + '.pdf' )
 
 
-def get_new_papers(skip_replacements=True, appearedon=None):
+# arxiv archives listed by default
+ARCHIVES = ('astro-ph',)
+
+# where listings, abstracts and e-prints are downloaded from
+# (e.g., a local stand-in, see benchmarks/arxiv_standin.py)
+ARXIV_URL = os.environ.get('ARXIV_URL', 'https://arxiv.org').rstrip('/')
+
+
+def set_arxiv_url(url):
+    """ Download listings, abstracts and e-prints from another server """
+    global ARXIV_URL
+    ARXIV_URL = url.rstrip('/')
+
+
+class Cassette(object):
+    """ Zip archive of the responses downloaded during a run
+
+    In record mode every response is stored as it is downloaded, in
+    replay mode the responses are served from the archive and nothing is
+    downloaded. Entries are named after the hash of their url, which is
+    kept as the entry comment.
+
+    Parameters
+    ----------
+    fname: str
+        archive file
+    mode: str
+        'record' (the archive is overwritten) or 'replay'
+    """
+    def __init__(self, fname, mode='replay'):
+        import zipfile
+        if mode not in ('record', 'replay'):
+            raise ValueError('Unknown cassette mode ' + str(mode))
+        self.fname = fname
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.archive = zipfile.ZipFile(fname, 'w' if mode == 'record' else 'r')
+        self.entries = {info.comment.decode('utf8'): info.filename
+                        for info in self.archive.infolist()}
+
+    def get(self, url):
+        """ recorded response of url """
+        with self._lock:
+            if url not in self.entries:
+                raise IOError('{0:s} is not in the cassette {1:s}'.format(url, self.fname))
+            return self.archive.read(self.entries[url])
+
+    def put(self, url, data):
+        """ record the response of url (once) """
+        import zipfile
+        with self._lock:
+            if url in self.entries:
+                return
+            info = zipfile.ZipInfo(hashlib.sha1(url.encode('utf8')).hexdigest(),
+                                   time.localtime()[:6])
+            info.comment = url.encode('utf8')
+            # e-prints are already gzipped
+            if data[:2] == b'\x1f\x8b':
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+            self.archive.writestr(info, data)
+            self.entries[url] = info.filename
+
+    def close(self):
+        with self._lock:
+            if self.archive.fp is not None:
+                self.archive.close()
+
+
+# responses recorded or replayed (see use_cassette)
+CASSETTE = None
+
+
+def use_cassette(fname, mode='replay'):
+    """ Record the responses of the run into fname, or replay them from it
+
+    Parameters
+    ----------
+    fname: str
+        archive file
+    mode: str
+        'record' or 'replay'
+    """
+    import atexit
+    global CASSETTE
+    if CASSETTE is not None:
+        CASSETTE.close()
+    CASSETTE = Cassette(fname, mode)
+    atexit.register(CASSETTE.close)
+    return CASSETTE
+
+
+def configure_downloads(options):
+    """ Apply the download options (--arxiv-url, --record, --replay) """
+    if options.get('arxiv_url'):
+        set_arxiv_url(options['arxiv_url'])
+    if options.get('record') and options.get('replay'):
+        raise ValueError('--record and --replay are exclusive')
+    if options.get('record'):
+        use_cassette(options['record'], 'record')
+    elif options.get('replay'):
+        use_cassette(options['replay'], 'replay')
+
+
+class _PooledResponse(object):
+    """ Response giving its connection back to the pool once read to the end """
+    def __init__(self, response, pool, key, connection):
+        self.response = response
+        self.pool = pool
+        self.key = key
+        self.connection = connection
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self.response.read()
+        else:
+            data = self.response.read(size)
+        # http.client closes the response at the end of the content
+        if self.connection is not None and self.response.isclosed():
+            self.pool.release(self.key, self.connection)
+            self.connection = None
+        return data
+
+    def close(self):
+        self.response.close()
+        if self.connection is not None:
+            # the rest of the content is still on the way: not reusable
+            self.connection.close()
+            self.connection = None
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ConnectionPool(object):
+    """ Persistent HTTP connections, reused between downloads
+
+    Opening a connection to arxiv (TCP and TLS handshakes) costs about as
+    much as downloading a listing. The pool keeps the idle connections of
+    each host open and the downloads of a long running process (see the
+    --daemon option of mpia.py) go through them. A response gives its
+    connection back once read to the end. Connections closed by the server
+    while idle are opened again. The proxies of the environment (e.g.,
+    http_proxy, https_proxy, no_proxy) are used like urlopen does: plain
+    requests go to the proxy, https ones are tunnelled through it.
+
+    Parameters
+    ----------
+    timeout: float
+        socket timeout in seconds
+    redirects: int
+        largest number of redirections followed
+    """
+    def __init__(self, timeout=60., redirects=5):
+        self.timeout = timeout
+        self.redirects = redirects
+        self.idle = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def proxy(key):
+        """ Proxy of (scheme, host) from the environment
+
+        Returns
+        -------
+        proxy: tuple
+            (host, headers) of the proxy, None for a direct connection
+        """
+        import base64
+        from urllib.parse import unquote, urlsplit
+        from urllib.request import getproxies, proxy_bypass
+        scheme, host = key
+        proxy = getproxies().get(scheme)
+        if not proxy or proxy_bypass(host):
+            return None
+        if '://' not in proxy:
+            proxy = 'http://' + proxy
+        parts = urlsplit(proxy)
+        headers = {}
+        if parts.username is not None:
+            credentials = '{0:s}:{1:s}'.format(unquote(parts.username),
+                                               unquote(parts.password or ''))
+            headers['Proxy-Authorization'] = 'Basic ' + base64.b64encode(
+                credentials.encode('utf8')).decode('ascii')
+        return parts.netloc.rpartition('@')[2], headers
+
+    def acquire(self, key):
+        """ idle connection to (scheme, host) or a new one, and whether it was idle """
+        with self._lock:
+            idle = self.idle.get(key)
+            if idle:
+                return idle.pop(), True
+        import http.client
+        scheme, host = key
+        proxy = self.proxy(key)
+        if proxy is None:
+            address = host
+        else:
+            address, headers = proxy
+        if scheme == 'https':
+            connection = http.client.HTTPSConnection(address, timeout=self.timeout)
+            if proxy is not None:
+                connection.set_tunnel(host, headers=headers)
+            return connection, False
+        return http.client.HTTPConnection(address, timeout=self.timeout), False
+
+    def release(self, key, connection):
+        """ keep an idle connection for the next download """
+        with self._lock:
+            self.idle.setdefault(key, []).append(connection)
+
+    def clear(self):
+        """ close the idle connections """
+        with self._lock:
+            idle, self.idle = self.idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def open(self, url):
+        """ Download url, following redirections
+
+        Returns
+        -------
+        stream: file object
+            content of the response
+
+        Raises
+        ------
+        urllib.error.HTTPError
+            for error statuses, like urlopen
+        """
+        import http.client
+        from urllib.error import HTTPError
+        from urllib.parse import urljoin, urlsplit
+        headers = {'User-Agent': 'Python-urllib/{0:d}.{1:d}'.format(*sys.version_info[:2])}
+        for _ in range(self.redirects + 1):
+            parts = urlsplit(url)
+            key = (parts.scheme, parts.netloc)
+            path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+            request_headers = headers
+            proxy = self.proxy(key) if parts.scheme == 'http' else None
+            if proxy is not None:
+                # a plain http proxy gets the whole url
+                path = '{0:s}://{1:s}{2:s}'.format(parts.scheme, parts.netloc, path)
+                request_headers = dict(headers, **proxy[1])
+            while True:
+                connection, reused = self.acquire(key)
+                try:
+                    connection.request('GET', path, headers=request_headers)
+                    response = connection.getresponse()
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    connection.close()
+                    # a new connection failing is a real error
+                    if not reused:
+                        raise
+            if response.status in (301, 302, 303, 307, 308):
+                location = response.getheader('Location')
+                response.read()
+                self.release(key, connection)
+                url = urljoin(url, location)
+                continue
+            if response.status >= 300:
+                response.read()
+                self.release(key, connection)
+                raise HTTPError(url, response.status, response.reason,
+                                response.headers, None)
+            return _PooledResponse(response, self, key, connection)
+        raise HTTPError(url, response.status, 'Too many redirections',
+                        response.headers, None)
+
+
+# persistent connections of the downloads (see use_keep_alive)
+POOL = None
+
+
+def use_keep_alive(enabled=True, timeout=60.):
+    """ Reuse the HTTP connections between downloads (see ConnectionPool) """
+    global POOL
+    if POOL is not None:
+        POOL.clear()
+    POOL = ConnectionPool(timeout) if enabled else None
+    return POOL
+
+
+def open_url(url):
+    """ Open a download, going through the cassette and the connection pool if any
+
+    Parameters
+    ----------
+    url: str
+        address to download
+
+    Returns
+    -------
+    stream: file object
+        content of the response
+    """
+    if CASSETTE is not None and CASSETTE.mode == 'replay':
+        return io.BytesIO(CASSETTE.get(url))
+    if POOL is not None:
+        response = POOL.open(url)
+    else:
+        from urllib.request import urlopen
+        response = urlopen(url)
+    if CASSETTE is not None:
+        data = response.read()
+        CASSETTE.put(url, data)
+        return io.BytesIO(data)
+    return response
+
+
+def fetch_url(url):
+    """ Download a page
+
+    Parameters
+    ----------
+    url: str
+        address of the page
+
+    Returns
+    -------
+    text: str
+        decoded content
+    """
+    with TRACER.span('fetch', url=url) as span:
+        data = open_url(url).read()
+        span['bytes'] = len(data)
+    return data.decode('utf-8')
+
+
+def merge_papers(listings):
+    """ Merge paper lists keeping the first occurrence of each identifier
+
+    Cross-listed papers appear in the listing of every archive they are
+    announced in; they are kept only once.
+
+    Parameters
+    ----------
+    listings: seq(list(ArXivPaper))
+        paper lists
+
+    Returns
+    -------
+    papers: list(ArXivPaper)
+        papers in order of first appearance
+    """
+    papers = {}
+    for listing in listings:
+        for paper in listing:
+            papers.setdefault(paper.identifier.split(':')[-1], paper)
+    return list(papers.values())
+
+
+def fetch_listings(urls, skip_replacements=True, max_workers=4):
+    """ Download and parse listing pages concurrently
+
+    Parameters
+    ----------
+    urls: seq(str)
+        listing pages
+    skip_replacements: bool
+        set to skip parsing the replacements
+    max_workers: int
+        number of pages downloaded at the same time
+
+    Returns
+    -------
+    papers: list(ArXivPaper)
+        papers of all the pages, without duplicates
+    """
+    return merge_papers(papers for _, papers in
+                        iter_listings(urls, skip_replacements=skip_replacements,
+                                      max_workers=max_workers))
+
+
+def iter_listings(urls, skip_replacements=True, max_workers=4):
+    """ Download and parse listing pages concurrently, in order
+
+    At most twice as many pages as workers are requested ahead of the
+    one being consumed, so that long ranges run in bounded memory.
+
+    Parameters
+    ----------
+    urls: seq(str)
+        listing pages
+    skip_replacements: bool
+        set to skip parsing the replacements
+    max_workers: int
+        number of pages downloaded at the same time
+
+    Returns
+    -------
+    listings: generator of (url, list(ArXivPaper))
+        papers of each page in the order of the urls
+    """
+    from collections import deque
+    from itertools import islice
+    from concurrent.futures import ThreadPoolExecutor
+    from html_parsers import ArxivListHTMLParser
+
+    def fetch(url):
+        html = fetch_url(url)
+        with TRACER.span('listing parse', url=url):
+            parser = ArxivListHTMLParser(skip_replacements=skip_replacements)
+            parser.feed(html)
+        return parser.papers
+
+    urls = iter(urls)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque((url, executor.submit(fetch, url))
+                        for url in islice(urls, 2 * max_workers))
+        while pending:
+            url, future = pending.popleft()
+            next_url = next(urls, None)
+            if next_url is not None:
+                pending.append((next_url, executor.submit(fetch, next_url)))
+            yield url, future.result()
+
+
+def parse_date(datestr=None):
+    """ Date given as dd/mm/yy, dd/mm/yyyy or today (default)
+
+    Returns
+    -------
+    date: datetime.date
+        corresponding date
+    """
+    from datetime import datetime, date
+    if datestr is None or 'today' in datestr.lower():
+        return date.today()
+    try:
+        # dd/mm/yy
+        return datetime.strptime(datestr, '%d/%m/%y').date()
+    except ValueError:
+        # dd/mm/yyyy
+        return datetime.strptime(datestr, '%d/%m/%Y').date()
+
+
+def get_new_papers(skip_replacements=True, appearedon=None, archives=ARCHIVES,
+                   max_workers=4):
     """ retrieve the new list from the website
     Parameters
     ----------
     skip_replacements: bool
         set to skip parsing the replacements
+    archives: seq(str)
+        arxiv archives to list (e.g., astro-ph, gr-qc)
+    max_workers: int
+        number of listings downloaded at the same time
 
     Returns
     -------
     papers: list(ArXivPaper)
         list of ArXivPaper objects
     """
-    url = "https://arxiv.org/list/astro-ph/new"
-    html = urlopen(url).read().decode('utf-8')
+    if isinstance(archives, basestring):
+        archives = [archives]
+    url = "{base:s}/list/{archive:s}/new"
+    return fetch_listings([url.format(base=ARXIV_URL, archive=archive) for archive in archives],
+                          skip_replacements=skip_replacements,
+                          max_workers=max_workers)
 
-    parser = ArxivListHTMLParser(skip_replacements=skip_replacements)
-    parser.feed(html)
-    papers = parser.papers
-    return papers
 
-
-def get_catchup_papers(since=None, skip_replacements=False, appearedon=None):
+def get_catchup_papers(since=None, skip_replacements=False, appearedon=None,
+                       archives=ARCHIVES, max_workers=4):
     """ retrieve the new list from the website
     Parameters
     ----------
@@ -1269,34 +3599,315 @@ def get_catchup_papers(since=None, skip_replacements=False, appearedon=None):
         data to start from
     skip_replacements: bool
         set to skip parsing the replacements
+    archives: seq(str)
+        arxiv archives to list (e.g., astro-ph, gr-qc)
+    max_workers: int
+        number of listings downloaded at the same time
 
     Returns
     -------
     papers: list(ArXivPaper)
         list of ArXivPaper objects
     """
-    from datetime import datetime, date
-    if since is None:
-        since = date.today().strftime('%d/%m/%y')
-    elif 'today' in since.lower():
-        since = date.today().strftime('%d/%m/%y')
+    _since = parse_date(since)
 
-    try:
-        # dd/mm/yy
-        _since = datetime.strptime(since, '%d/%m/%y')
-    except ValueError:
-        # dd/mm/yyyy
-        _since = datetime.strptime(since, '%d/%m/%Y')
+    if isinstance(archives, basestring):
+        archives = [archives]
+    url = "{base:s}/catchup?syear={year:d}&smonth={month:d}&sday={day:d}&num=1000&archive={archive:s}&method=without"
+    urls = [url.format(base=ARXIV_URL, day=_since.day, month=_since.month,
+                       year=_since.year, archive=archive) for archive in archives]
+    return fetch_listings(urls, skip_replacements=skip_replacements,
+                          max_workers=max_workers)
 
-    url = "https://arxiv.org/catchup?syear={year:d}&smonth={month:d}&sday={day:d}&num=1000&archive=astro-ph&method=without"
-    html = urlopen(url.format(day=_since.day, 
-                              month=_since.month, 
-                              year=_since.year)).read().decode('utf-8')
 
-    parser = ArxivListHTMLParser(skip_replacements=skip_replacements)
-    parser.feed(html)
-    papers = parser.papers
-    return papers
+def iter_catchup_papers(since=None, until=None, skip_replacements=False,
+                        archives=ARCHIVES, max_workers=4, verbose=True):
+    """ Stream the papers announced over a range of days
+
+    The listing of each day and archive is a page of its own, so the
+    range is not limited by the size of a single catchup page. Pages are
+    downloaded concurrently, papers are yielded as their day arrives and
+    cross-listed or repeated papers are yielded once.
+
+    Parameters
+    ----------
+    since: string
+        first day (dd/mm/yy, dd/mm/yyyy or today)
+    until: string
+        last day included (default: today)
+    skip_replacements: bool
+        set to skip parsing the replacements
+    archives: seq(str)
+        arxiv archives to list (e.g., astro-ph, gr-qc)
+    max_workers: int
+        number of listings downloaded at the same time
+    verbose: bool
+        report the progress
+
+    Returns
+    -------
+    papers: generator of ArXivPaper
+        papers in order of announcement
+    """
+    import datetime
+    first, last = parse_date(since), parse_date(until)
+    if isinstance(archives, basestring):
+        archives = [archives]
+    # nothing is announced on week-ends
+    days = [first + datetime.timedelta(days=k) for k in range((last - first).days + 1)]
+    days = [day for day in days if day.weekday() < 5]
+    url = "{base:s}/catchup/{archive:s}/{day:s}"
+    urls = [url.format(base=ARXIV_URL, archive=archive, day=day.isoformat())
+            for day in days for archive in archives]
+
+    seen = set()
+    for number, (where, papers) in enumerate(
+            iter_listings(urls, skip_replacements=skip_replacements,
+                          max_workers=max_workers), 1):
+        new = 0
+        for paper in papers:
+            key = paper.identifier.split(':')[-1]
+            if key in seen:
+                continue
+            seen.add(key)
+            new += 1
+            yield paper
+        if verbose:
+            color_print('*** catchup [{0:d}/{1:d}] {2:s}: {3:d} papers, {4:d} new'.format(
+                number, len(urls), where, len(papers), new), 'cyan')
+
+
+def local_identifiers(days=None):
+    """ Identifiers of the papers whose source is kept locally
+
+    Parameters
+    ----------
+    days: seq(datetime.date)
+        only the papers retrieved on these days (default: all)
+
+    Returns
+    -------
+    identifiers: list(str)
+        sorted identifiers
+    """
+    import json
+    if days is not None:
+        days = set(day.isoformat() for day in days)
+    identifiers = []
+    for fname in sorted(glob(__CACHE__ + '/eprints/*.json')):
+        with open(fname) as fin:
+            data = json.load(fin)
+        if days is None or data.get('day') in days:
+            identifiers.append(data['identifier'])
+    return identifiers
+
+
+def rerender_papers(identifiers, template=None, mitarbeiter=(), output=None,
+                    max_workers=4, verbose=None, **compile_options):
+    """ Rebuild postages from the locally kept sources only
+
+    Each paper is extracted in its own directory and compiled in
+    parallel; nothing is downloaded. Parallel compilations are quiet, their
+    outputs would interleave: the errors of the failed ones are reported
+    from their logs.
+
+    Parameters
+    ----------
+    identifiers: seq(str)
+        papers to rebuild
+    template: ExportPDFLatexTemplate
+        template of the postages
+    mitarbeiter: list(str)
+        authors to highlight
+    output: str
+        directory receiving the postages (default: the current one)
+    max_workers: int
+        number of compilations running at the same time
+    verbose: bool
+        set to print the progress and compilation outputs (default: only
+        if a single compilation runs at a time)
+    compile_options: dict
+        passed to DocumentSource.compile
+
+    Returns
+    -------
+    results: list(tuple)
+        (identifier, postage or None, error message or None) of each paper
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    if output is None:
+        output = os.getcwd()
+    if verbose is None:
+        verbose = max_workers == 1
+
+    def rerender(identifier):
+        _identifier = identifier.split(':')[-1]
+        with TRACER.context(paper=_identifier):
+            try:
+                paper = ArXivPaper.from_local(_identifier)
+                highlight_papers([paper], mitarbeiter, verbose=verbose)
+                document = paper.load_document_source(
+                    '{0:s}/tmp/rerender/{1:s}'.format(__ROOT__, _identifier.replace('/', '_')),
+                    verbose=verbose)
+                pdf = document.compile(template=template, verbose=verbose, **compile_options)
+                if pdf is None:
+                    result = document.compile_result
+                    raise RuntimeError('Compilation failed -- ' +
+                                       (result.report() if result is not None else 'None'))
+                destination = os.path.join(output, _identifier.replace('/', '_') + '.pdf')
+                shutil.move(pdf, destination)
+                return identifier, destination, None
+            except Exception as error:
+                raise_or_warn(error, verbose=verbose)
+                return identifier, None, str(error)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(rerender, identifiers))
+
+
+class PostageResult(object):
+    """ Outcome of the postage of a paper (see generate_postages) """
+
+    def __init__(self, paper):
+        self.identifier = paper.identifier
+        self.title = paper.title
+        self.authors = list(paper._authors)
+        self.matched_authors = list(paper.highlight_authors)
+        self.pdf = None
+        self.error = None
+        # output of the postage compilation (see LatexResult)
+        self.log = []
+        # seconds spent in each stage (see Tracer)
+        self.timings = {}
+        self.elapsed = 0.
+
+    @property
+    def ok(self):
+        return self.pdf is not None
+
+    def to_dict(self):
+        """ result as json types """
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        status = self.pdf if self.ok else 'failed: ' + str(self.error)
+        return 'PostageResult({0:s}, {1:s}, {2:.1f}s)'.format(
+            self.identifier, status, self.elapsed)
+
+
+async def generate_postages(papers, mitarbeiter, template=None, words=(),
+                            output=None, workdir=None, max_concurrency=4,
+                            verbose=False, **compile_options):
+    """ Make the postages of the matching papers, yielding each as it is done
+
+    Papers without a matching author are skipped. Downloading, parsing
+    and compiling run in threads, at most max_concurrency papers at a
+    time; the paper iterable (e.g., iter_catchup_papers) is consumed as
+    slots become free. Nothing is printed unless verbose: the output of
+    the compilation is kept in the log of each result.
+
+    Example::
+
+        async for result in generate_postages(get_new_papers(), mitarbeiter,
+                                              template=MPIATemplate(),
+                                              output='postages'):
+            print(result.identifier, result.pdf or result.error)
+
+    Parameters
+    ----------
+    papers: iterable(ArXivPaper)
+        candidate papers
+    mitarbeiter: list(str)
+        authors to look for (see get_mitarbeiter)
+    template: ExportPDFLatexTemplate
+        template of the postages
+    words: seq(str)
+        words that must all appear in the paper source
+    output: str
+        directory receiving the postages (default: the current one)
+    workdir: str
+        where the sources are extracted (default: a temporary directory
+        removed at the end)
+    max_concurrency: int
+        number of papers processed at the same time
+    verbose: bool
+        set to print the progress messages and the compilation output
+    compile_options: dict
+        passed to DocumentSource.compile
+
+    Returns
+    -------
+    results: async generator of PostageResult
+        in order of completion
+    """
+    import asyncio
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    if output is None:
+        output = os.getcwd()
+    cleanup = workdir is None
+    if cleanup:
+        workdir = tempfile.mkdtemp(prefix='postages_')
+
+    def make(paper):
+        result = PostageResult(paper)
+        _identifier = paper.identifier.split(':')[-1].replace('/', '_')
+        start = time.time()
+        with TRACER.context(paper=_identifier), TRACER.collect() as spans:
+            try:
+                document = paper.retrieve_document_source(os.path.join(workdir, _identifier),
+                                                          verbose=verbose)
+                if not check_required_words(document, words):
+                    raise RuntimeError('Not an institute paper -- ' +
+                                       check_required_words(document, words, verbose=True))
+                pdf = document.compile(template=template, verbose=verbose, **compile_options)
+                if document.compile_result is not None:
+                    result.log = document.compile_result.log
+                if pdf is None:
+                    raise RuntimeError('Compilation failed -- ' + str(document.compile_result))
+                result.pdf = os.path.join(output, _identifier + '.pdf')
+                shutil.move(pdf, result.pdf)
+            except Exception as error:
+                result.error = '{0:s}: {1!s}'.format(type(error).__name__, error)
+        for span in spans:
+            result.timings[span['stage']] = result.timings.get(span['stage'], 0.) + span['elapsed']
+        result.elapsed = time.time() - start
+        return result
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    papers = iter(papers)
+    pending = set()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_concurrency:
+                # the listing may download while it is consumed
+                paper = await loop.run_in_executor(None, next, papers, None)
+                if paper is None:
+                    exhausted = True
+                elif filter_papers([paper], mitarbeiter, verbose=verbose)[0]:
+                    pending.add(loop.run_in_executor(executor, make, paper))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # queued papers are dropped, running ones cannot be interrupted:
+        # wait for them before removing the directories they work in
+        for future in pending:
+            future.cancel()
+        stop = functools.partial(executor.shutdown, wait=True, cancel_futures=True)
+        try:
+            await loop.run_in_executor(None, stop)
+        except BaseException:
+            # cancelled again or the loop is closing: wait blocking
+            stop()
+            raise
+        finally:
+            if cleanup:
+                shutil.rmtree(workdir, ignore_errors=True)
 
 
 def get_mitarbeiter(source=__ROOT__+'/mitarbeiter.txt'):
@@ -1327,7 +3938,7 @@ def get_mitarbeiter(source=__ROOT__+'/mitarbeiter.txt'):
     return list(sorted(set(mitarbeiter)))
 
 
-def highlight_papers(papers, fname_list):
+def highlight_papers(papers, fname_list, verbose=True):
     """ Extract papers when an author match is found
 
     Parameters
@@ -1336,6 +3947,8 @@ def highlight_papers(papers, fname_list):
         paper list
     fname_list: list(str)
         authors to search
+    verbose: bool
+        set to print the papers and the matches
 
     Returns
     -------
@@ -1345,7 +3958,8 @@ def highlight_papers(papers, fname_list):
     keep = []
     matched_authors = []
     for paper in papers:
-        print(paper)
+        if verbose:
+            print(paper)
         paper.highlight_authors = []
         for author in paper._authors:
             for name in fname_list:
@@ -1353,14 +3967,15 @@ def highlight_papers(papers, fname_list):
                     # perfect match on family name
                     # TODO: add initials test
                     if (name == author.split()[-1]):
-                        print('*** Matching author: ', name, author)
+                        if verbose:
+                            print('*** Matching author: ', name, author)
                         matched_authors.append((name, author, paper.identifier))
                         paper.highlight_authors.append(author)
         keep.append(paper)
     return keep, matched_authors
 
 
-def filter_papers(papers, fname_list):
+def filter_papers(papers, fname_list, verbose=True):
     """ Extract papers when an author match is found
     Parameters
     ----------
@@ -1368,6 +3983,8 @@ def filter_papers(papers, fname_list):
         paper list
     fname_list: list(str)
         authors to search
+    verbose: bool
+        set to print the matches
 
     Returns
     -------
@@ -1385,7 +4002,8 @@ def filter_papers(papers, fname_list):
                     if name in author:
                         # TODO: add initials test
                         if (name == author.split()[-1]):
-                            print("*** Matched author: ", name, author)
+                            if verbose:
+                                print("*** Matched author: ", name, author)
                             matched_authors.append((name, author, paper.identifier))
                             paper.highlight_authors.append(author)
                             keep.append(paper)
@@ -1418,6 +4036,26 @@ def running_options():
             ('-d', '--date', dict(dest="date", help="Impose date on the printouts (e.g., today)", default='', type='str')),
             ('-c', '--catchup', dict(dest="since", help="Catchup arxiv from given date (e.g., today, 03/01/2018)", default='', type='str')),
             ('--selectfile', dict(dest="select_main", default=False, action="store_true", help="Set to select the main tex file manually")),
+            ('--archives', dict(dest="archives", default=','.join(ARCHIVES), type='str', help="Comma separated arxiv archives to list (e.g., astro-ph,gr-qc)")),
+            ('--until', dict(dest="until", help="Last day of the catchup (e.g., 14/03/2018), listings are then fetched day by day", default='', type='str')),
+            ('--trace', dict(dest="trace", default='', type='str', help="Append the timing of each stage as JSON lines to this file")),
+            ('--arxiv-url', dict(dest="arxiv_url", default='', type='str', help="Server to download from instead of https://arxiv.org (also ARXIV_URL)")),
+            ('--record', dict(dest="record", default='', type='str', help="Save every downloaded response into this zip archive")),
+            ('--replay', dict(dest="replay", default='', type='str', help="Serve every download from a recorded zip archive (no network)")),
+            ('--rerender', dict(dest="rerender", default='', type='str', help="Rebuild the postages of these identifiers or retrieval days (comma separated) from the local sources only")),
+            ('--template', dict(dest="template", default='', type='str', help="Template class of the postages as module:Class (e.g., mpia:MPIATemplate)")),
+            ('--jobs', dict(dest="jobs", default=4, type='int', help="Number of postages compiled at the same time when rebuilding")),
+            ('--groups', dict(dest="groups", default='', type='str', help="Ini file of groups (authors, required words, template, output) served from a single pass")),
+            ('--booklet', dict(dest="booklet", default='', type='str', help="Compile all postages into a single booklet pdf")),
+            ('--split', dict(dest="split_booklet", default=False, action="store_true", help="Also split the booklet into one pdf per paper")),
+            ('--timeout', dict(dest="timeout", default=0, type='float', help="Wall-clock budget of each pdflatex run in seconds")),
+            ('--no-cache', dict(dest="cache", default=True, action="store_false", help="Recompile postages even if their inputs did not change")),
+            ('--workspace', dict(dest="workspace", default=False, action="store_true", help="Compile postages in a minimal temporary directory")),
+            ('--optimize-figures', dict(dest="optimize_figures", default=False, action="store_true", help="Downsample large images and rasterize heavy vector figures before compiling")),
+            ('--daemon', dict(dest="daemon", default=False, action="store_true", help="Stay resident and make the postages of the papers new to each poll of the listing")),
+            ('--interval', dict(dest="interval", default=10., type='float', help="Minutes between the polls of the daemon")),
+            ('--polls', dict(dest="polls", default=0, type='int', help="Number of polls before the daemon exits (0: no limit)")),
+            ('--seen', dict(dest="seen", default=__CACHE__ + '/seen.txt', type='str', help="File of the identifiers already processed by the daemon")),
             ('--debug', dict(dest="debug", default=False, action="store_true", help="Set to raise exceptions on errors")),
         )
 
@@ -1450,6 +4088,14 @@ def main(template=None):
     sourcedir = options.get('sourcedir', None)
     catchup_since = options.get('since', None)
     select_main = options.get('select_main', False)
+    optimize_figures = options.get('optimize_figures', False)
+    workspace = options.get('workspace', False)
+    cache = options.get('cache', True)
+    if template is not None and options.get('timeout'):
+        template.compile_timeout = options['timeout']
+
+    archives = options.get('archives', ','.join(ARCHIVES)).split(',')
+    configure_downloads(options)
 
     mitarbeiter_list = options.get('mitarbeiter', __ROOT__+'/mitarbeiter.txt')
     mitarbeiter = get_mitarbeiter(mitarbeiter_list)
@@ -1458,16 +4104,23 @@ def main(template=None):
         paper = DocumentSource(sourcedir, autoselect=(not select_main))
         paper.identifier = sourcedir
         keep, _ = highlight_papers([paper], mitarbeiter)
-        paper.compile(template=template)
-        name = paper.outputname.replace('.tex', '.pdf').split('/')[-1]
-        shutil.move(sourcedir + '/' + name, paper.identifier + '.pdf')
+        pdf = paper.compile(template=template, optimize_figures=optimize_figures,
+                            workspace=workspace, cache=cache)
+        if pdf is None:
+            raise RuntimeError('Compilation failed -- ' + str(paper.compile_result))
+        shutil.move(pdf, paper.identifier + '.pdf')
         print("PDF postage:", paper.identifier + '.pdf' )
         return 
     elif identifier in (None, '', 'None'):
-        if catchup_since not in (None, '', 'None', 'today'):
-            papers = get_catchup_papers(skip_replacements=True)
+        if options.get('until'):
+            papers = iter_catchup_papers(since=catchup_since or None,
+                                         until=options['until'],
+                                         skip_replacements=True, archives=archives)
+        elif catchup_since not in (None, '', 'None', 'today'):
+            papers = get_catchup_papers(since=catchup_since, skip_replacements=True,
+                                        archives=archives)
         else:
-            papers = get_new_papers(skip_replacements=True)
+            papers = get_new_papers(skip_replacements=True, archives=archives)
         keep, _ = filter_papers(papers, mitarbeiter)
     else:
         papers = [ArXivPaper(identifier=identifier.split(':')[-1], appearedon=check_date(options.get('date')))]
@@ -0,0 +1,236 @@
+"""
+Local arXiv stand-in
+====================
+
+Serves synthetic listing, abstract and e-print responses on the paths the
+code downloads from, so that the whole pipeline can be load tested
+without network:
+
+    python benchmarks/arxiv_standin.py --papers 1000 --latency 0.05 --error-rate 0.01
+    python mpia.py --arxiv-url http://localhost:8000 --trace trace.jsonl
+
+Served paths:
+
+    /list/<archive>/new                  listing of --papers papers
+    /catchup?...&archive=<archive>       same
+    /catchup/<archive>/<YYYY-MM-DD>      listing of the day
+    /abs/<identifier>                    abstract page
+    /e-print/<identifier>                gzipped tarball
+
+A fraction --match-rate of the papers has a first author from the staff
+list and the required institute words in its source, so that they go all
+the way to the postage. Responses are deterministic for a given seed
+(apart from the padding bytes); latency and errors are drawn per request.
+"""
+from __future__ import print_function
+import io
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+
+__ROOT__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench_pipeline import make_listing, make_abstract_page, make_eprint, name
+
+
+class StandinServer(ThreadingHTTPServer):
+    """ HTTP server generating arxiv-like responses
+
+    Parameters
+    ----------
+    address: tuple
+        (host, port)
+    papers: int
+        papers per listing page
+    sections: int
+        sections of each paper
+    padding: int
+        incompressible bytes added to each e-print
+    latency: float
+        mean delay of the responses in seconds
+    jitter: float
+        delays are uniform in latency +/- jitter
+    error_rate: float
+        fraction of requests answered with a 503
+    staff: seq(str)
+        family names used for the matching papers
+    match_rate: float
+        fraction of papers with a staff author
+    words: seq(str)
+        words added to the source of the matching papers
+    seed: int
+        seed of the generated content
+    """
+    daemon_threads = True
+
+    def __init__(self, address, papers=1000, sections=20, padding=0,
+                 latency=0., jitter=0., error_rate=0., staff=(),
+                 match_rate=0.05, words=(), seed=42, verbose=False):
+        ThreadingHTTPServer.__init__(self, address, StandinHandler)
+        self.papers = papers
+        self.sections = sections
+        self.padding = padding
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.staff = list(staff)
+        self.match_rate = match_rate
+        self.words = list(words)
+        self.seed = seed
+        self.verbose = verbose
+        rng = random.Random(seed)
+        self.authors = [name(rng) for _ in range(5 * papers)]
+        # authors of the listed papers, by identifier
+        self.listed = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def listing(self, key):
+        """ listing page, identifiers are prefixed by a number derived from the key """
+        rng = random.Random('{0:d} {1:s}'.format(self.seed, key))
+        prefix = '{0:04d}'.format(rng.randrange(10000))
+        html, papers = make_listing(rng, self.papers, self.authors, prefix=prefix,
+                                    staff=self.staff, match_rate=self.match_rate)
+        with self._lock:
+            self.listed.update(papers)
+        return html.encode('utf8')
+
+    def abstract(self, identifier):
+        rng = random.Random('{0:d} {1:s}'.format(self.seed, identifier))
+        authors = self.listed.get(identifier)
+        return make_abstract_page(rng, 8, authors).encode('utf8')
+
+    def eprint(self, identifier):
+        rng = random.Random('{0:d} {1:s}'.format(self.seed, identifier))
+        authors = self.listed.get(identifier, [])
+        staff = any(author.split()[-1] in self.staff for author in authors)
+        fileobj = io.BytesIO()
+        make_eprint(rng, fileobj, self.sections,
+                    words=self.words if staff else (), padding=self.padding)
+        return fileobj.getvalue()
+
+    def delay(self):
+        """ response delay and whether to fail, drawn for a request """
+        with self._lock:
+            delay = self.latency + self.jitter * (2 * self._random.random() - 1)
+            failed = self._random.random() < self.error_rate
+        return max(delay, 0.), failed
+
+    def count(self, kind, size):
+        with self._lock:
+            stats = self.stats.setdefault(kind, [0, 0])
+            stats[0] += 1
+            stats[1] += size
+
+    def print_stats(self):
+        for kind, (requests, size) in sorted(self.stats.items()):
+            print('{0:10s} {1:8d} requests {2:10.2f} MB'.format(
+                kind, requests, size / 1024. ** 2))
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """ routes the requests to the generators of the server """
+
+    # keep the connections open between requests, like arxiv
+    protocol_version = 'HTTP/1.1'
+
+    routes = ((re.compile(r'^/list/([^/]+)/new'), 'listing', 'text/html'),
+              (re.compile(r'^/catchup/([^/]+/[0-9-]+)'), 'listing', 'text/html'),
+              (re.compile(r'^/catchup\?(.*)'), 'listing', 'text/html'),
+              (re.compile(r'^/abs/([^/?]+)'), 'abstract', 'text/html'),
+              (re.compile(r'^/e-print/([^/?]+)'), 'eprint', 'application/x-eprint-tar'))
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        # headers and content are written apart: do not wait for the acks
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.server.count('connections', 0)
+
+    def do_GET(self):
+        server = self.server
+        delay, failed = server.delay()
+        time.sleep(delay)
+        for pattern, kind, content_type in self.routes:
+            match = pattern.match(self.path)
+            if match is not None:
+                break
+        else:
+            self.send_error(404)
+            return
+        if failed:
+            server.count('errors', 0)
+            self.send_error(503)
+            return
+        data = getattr(server, kind)(match.group(1))
+        server.count(kind, len(data))
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, *args)
+
+
+def main():
+    from optparse import OptionParser
+    parser = OptionParser()
+    parser.add_option('--host', dest='host', default='localhost', type='str')
+    parser.add_option('-p', '--port', dest='port', default=8000, type='int')
+    parser.add_option('--papers', dest='papers', default=1000, type='int',
+                      help='papers per listing page')
+    parser.add_option('--sections', dest='sections', default=20, type='int',
+                      help='sections of each paper (one figure every four)')
+    parser.add_option('--eprint-kb', dest='eprint_kb', default=0, type='float',
+                      help='incompressible kB added to each e-print')
+    parser.add_option('--latency', dest='latency', default=0., type='float',
+                      help='mean response delay in seconds')
+    parser.add_option('--jitter', dest='jitter', default=0., type='float',
+                      help='delays are uniform in latency +/- jitter')
+    parser.add_option('--error-rate', dest='error_rate', default=0., type='float',
+                      help='fraction of requests answered with a 503')
+    parser.add_option('--staff', dest='staff', default=__ROOT__ + '/mitarbeiter.txt',
+                      type='str', help='family names of the matching authors')
+    parser.add_option('--match-rate', dest='match_rate', default=0.05, type='float',
+                      help='fraction of papers with a staff author')
+    parser.add_option('--words', dest='words', default='Heidelberg,Max,Planck,69117',
+                      type='str', help='words added to the matching papers')
+    parser.add_option('--seed', dest='seed', default=42, type='int')
+    parser.add_option('-v', '--verbose', dest='verbose', default=False,
+                      action='store_true', help='log the requests')
+    (options, args) = parser.parse_args()
+
+    with open(options.staff, errors='surrogateescape') as fin:
+        staff = [line.split()[-1] for line in fin
+                 if line.strip() and not line.startswith('#')]
+
+    server = StandinServer((options.host, options.port), papers=options.papers,
+                           sections=options.sections,
+                           padding=int(options.eprint_kb * 1024),
+                           latency=options.latency, jitter=options.jitter,
+                           error_rate=options.error_rate, staff=staff,
+                           match_rate=options.match_rate,
+                           words=[word for word in options.words.split(',') if word],
+                           seed=options.seed, verbose=options.verbose)
+    print('arxiv stand-in on http://{0:s}:{1:d}'.format(*server.server_address[:2]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.print_stats()
+
+
+if __name__ == "__main__":
+    main()
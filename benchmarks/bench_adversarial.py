@@ -0,0 +1,131 @@
+"""
+Adversarial parsing benchmark
+=============================
+
+Times the parsing of a document (Document, title, authors, abstract,
+arxiver tag, structure and figures) on sources built to defeat the text
+scans: megabyte-long single lines, thousands of comment signs, unclosed
+command definitions and options, deeply nested braces and long runs of
+backslashes, each at several sizes.
+
+The size is the number of characters of the pathological part. Parsing
+must scale linearly: the script reports the scaling exponent of each time
+with respect to the smallest size (1 is linear, 2 is quadratic) and exits
+with an error when one is above --max-exponent.
+
+    python benchmarks/bench_adversarial.py [--sizes 100000,200000,400000,800000]
+"""
+from __future__ import print_function
+import math
+import os
+import sys
+
+__ROOT__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, __ROOT__)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import app
+from bench_pipeline import best_time
+
+HEADER = '\\documentclass{aa}\n\\newcommand{\\kms}{km\\,s$^{-1}$}\n'
+TITLE = '\\title{A title}\n\\author{A. Author \\and B. Author}\n'
+
+
+def document(header='', body='', last=''):
+    """ source with the given header and body, ending with last (no newline) """
+    return (HEADER + header + '\\begin{document}\n' + TITLE + body +
+            '\n\\end{document}\n' + last)
+
+
+# pathological sources of (about) size characters
+CASES = (
+    # one line without figure: retried from each of its characters
+    ('long line', lambda size: document(body='word ' * (size // 5))),
+    # one line with a figure: the begin and end markers are far apart
+    ('long figure', lambda size: document(
+        body='\\begin{figure}' + 'x' * size + '\\end{figure}')),
+    # comment signs on a last line without newline
+    ('percents', lambda size: document(last='%' * size)),
+    # comment signs on a line of their own
+    ('comment line', lambda size: document(body='%' * size)),
+    # command definitions that are never closed
+    ('open commands', lambda size: document(
+        header='\\newcommand{' * (size // 12) + '\n')),
+    # arxiver tags that are never closed
+    ('open tags', lambda size: document(
+        body='%@arxiver{' * (size // 10))),
+    # title options that are never closed
+    ('open options', lambda size: document(body='\\title[' * (size // 7))),
+    # deeply nested braces in the abstract
+    ('nested braces', lambda size: document(
+        body='\\abstract{' + '{' * (size // 2) + '}' * (size // 2) + '}')),
+    # a word of backslashes without section
+    ('backslashes', lambda size: document(body='\\a' * (size // 2))),
+)
+
+
+def parse(data):
+    """ parse everything a template uses """
+    try:
+        document = app.Document(data)
+        document.title, document.authors, document.abstract
+        document.arxivertag
+        document._parse_structure()
+    except Exception:
+        # pathological sources do not need to make sense
+        pass
+
+
+def run(sizes, repeat=3):
+    """ time every case at every size
+
+    Returns
+    -------
+    results: dict
+        best time in seconds of "case[size]"
+    """
+    results = {}
+    for case, make in CASES:
+        for size in sizes:
+            data = make(size)
+            key = '{0:s}[{1:d}]'.format(case, size)
+            results[key] = best_time(lambda: parse(data), repeat)
+    return results
+
+
+def main():
+    from optparse import OptionParser
+    parser = OptionParser()
+    parser.add_option('--sizes', dest='sizes', default='100000,200000,400000,800000',
+                      type='str', help='comma separated input sizes')
+    parser.add_option('-r', '--repeat', dest='repeat', default=3, type='int',
+                      help='number of runs of each measurement')
+    parser.add_option('--max-exponent', dest='max_exponent', default=1.5, type='float',
+                      help='largest tolerated scaling exponent')
+    parser.add_option('--min-time', dest='min_time', default=1e-2, type='float',
+                      help='timings shorter than this (in seconds) are not checked')
+    (options, args) = parser.parse_args()
+
+    sizes = sorted(int(size) for size in options.sizes.split(','))
+    results = run(sizes, options.repeat)
+
+    failed = False
+    for case, _ in CASES:
+        smallest = results['{0:s}[{1:d}]'.format(case, sizes[0])]
+        for size in sizes:
+            key = '{0:s}[{1:d}]'.format(case, size)
+            elapsed = results[key]
+            status = ''
+            if size > sizes[0]:
+                exponent = (math.log(max(elapsed, 1e-9) / max(smallest, 1e-9)) /
+                            math.log(float(size) / sizes[0]))
+                status = 'x^{0:.2f}'.format(exponent)
+                if exponent > options.max_exponent and elapsed > options.min_time:
+                    status += '  SUPERLINEAR'
+                    failed = True
+            print('{0:30s} {1:10.2f} ms  {2:s}'.format(key, 1e3 * elapsed, status))
+    sys.exit(int(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Memory benchmark
+================
+
+Measures the peak resident memory of parsing a large source: a paper
+whose main file includes a table of --size MB of inline data. Each mode
+(normal and large document mode, see app.Document) runs in a new
+interpreter, which parses the source and reads everything a template uses.
+
+    python benchmarks/bench_memory.py [--size 200] [--max-ratio 4]
+
+The peak memory and the memory still used by the parsed document are
+reported relative to the size of the source, and the script exits with an
+error when the peak of the large document mode goes above --max-ratio.
+"""
+from __future__ import print_function
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+__ROOT__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import make_eprint
+
+# run in a new interpreter: prints the peak and current resident memory
+# before and after parsing (the current one is 0 where /proc is missing)
+MEASURE = """
+import contextlib, io, os, sys
+sys.path.insert(0, {root!r})
+import app
+def resident():
+    try:
+        with open('/proc/self/statm') as fin:
+            return int(fin.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (IOError, OSError, ValueError):
+        return 0
+before = app._peak_rss(), resident()
+with contextlib.redirect_stdout(io.StringIO()):
+    document = app.DocumentSource({directory!r}, large={large!r})
+    document.title, document.authors, document.abstract
+    document._parse_structure()
+    document.to_dict()
+print(before[0], app._peak_rss(), before[1], resident())
+"""
+
+
+def make_source(directory, size, seed=42):
+    """ paper in directory including a table of size bytes """
+    import tarfile
+    rng = random.Random(seed)
+    fname = os.path.join(directory, 'eprint.tar.gz')
+    make_eprint(rng, fname, 20)
+    with tarfile.open(fname) as tar:
+        tar.extractall(directory)
+    os.remove(fname)
+    main = os.path.join(directory, 'main.tex')
+    with open(main) as fin:
+        data = fin.read()
+    with open(main, 'w') as fout:
+        fout.write(data.replace('\\end{document}', '\\input{table.tex}\n\\end{document}'))
+    with open(os.path.join(directory, 'table.tex'), 'w') as fout:
+        fout.write('\\begin{tabular}{rrrrrrrr}\n')
+        written = 0
+        while written < size:
+            row = ' & '.join('{0:.6f}'.format(rng.random()) for _ in range(8))
+            line = row + ' \\\\ % row\n'
+            fout.write(line)
+            written += len(line)
+        fout.write('\\end{tabular}\n')
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for name in ('main.tex', 'table.tex'))
+
+
+def memory(directory, large):
+    """ additional peak and kept resident memory (bytes) of parsing the source """
+    code = MEASURE.format(root=__ROOT__, directory=directory, large=large)
+    output = subprocess.check_output([sys.executable, '-c', code])
+    # the last line: the parsing may print warnings
+    last = output.decode('utf8', 'replace').splitlines()[-1]
+    peak_before, peak_after, before, after = [int(value) for value in last.split()]
+    return peak_after - peak_before, after - before
+
+
+def main():
+    from optparse import OptionParser
+    parser = OptionParser()
+    parser.add_option('--size', dest='size', default=200., type='float',
+                      help='size of the included table in MB')
+    parser.add_option('--max-ratio', dest='max_ratio', default=4., type='float',
+                      help='largest tolerated peak memory over source size')
+    (options, args) = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='bench_')
+    try:
+        size = make_source(directory, int(options.size * 1024 ** 2))
+        failed = False
+        for mode, large in (('normal', False), ('large', True)):
+            peak, kept = memory(directory, large)
+            ratio = float(peak) / size
+            status = ''
+            if large and ratio > options.max_ratio:
+                status = '  TOO LARGE'
+                failed = True
+            print('{0:10s} source {1:8.1f} MB  peak {2:8.1f} MB  x{3:.2f}  '
+                  'kept {4:8.1f} MB  x{5:.2f}{6:s}'.format(
+                      mode, size / 1024. ** 2, peak / 1024. ** 2, ratio,
+                      kept / 1024. ** 2, float(kept) / size, status))
+    finally:
+        shutil.rmtree(directory)
+    sys.exit(int(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+"""
+Pipeline benchmark
+==================
+
+Times the offline stages of a run on a synthetic corpus of arxiv listing
+pages, abstract pages and e-print tarballs: listing parse, abstract parse,
+author filtering, e-print extraction, DocumentSource construction, figure
+selection and template rendering, each at several input sizes.
+
+The size is the number of papers of the listing and of staff members, and
+the number of sections of the paper (with one figure every four sections).
+
+    python benchmarks/bench_pipeline.py [--sizes 10,100,1000] [--repeat 5]
+    python benchmarks/bench_pipeline.py --save       # store the baseline
+    python benchmarks/bench_pipeline.py --tolerance 0.25
+
+Timings are compared to the stored baseline (benchmarks/baseline.json by
+default) and the script exits with an error if a stage got slower than
+the tolerance allows.
+"""
+from __future__ import print_function
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import struct
+import sys
+import tarfile
+import tempfile
+import time
+import zlib
+
+__ROOT__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, __ROOT__)
+
+import app
+import mpia
+from html_parsers import ArxivListHTMLParser, ArxivAbstractHTMLParser
+
+# words used to generate names and text
+SYLLABLES = ('ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'te', 'vi', 'zo', 'ber',
+             'dor', 'gan', 'hel', 'mar', 'son', 'ter', 'wen', 'xel')
+WORDS = ('star', 'galaxy', 'disk', 'model', 'dust', 'gas', 'orbit', 'mass',
+         'spectrum', 'survey', 'cluster', 'halo', 'planet', 'metallicity')
+
+
+def name(rng):
+    """ random author name (first and last name) """
+    first = ''.join(rng.choice(SYLLABLES) for _ in range(2)).capitalize()
+    last = ''.join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+    return first + ' ' + last
+
+
+def sentence(rng, nwords=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(nwords)).capitalize() + '.'
+
+
+def png(width, height):
+    """ valid blank png of the given size (about a kilobyte)
+
+    The image is 1 bit grayscale: its scanlines (a filter byte and the
+    pixels) compress to almost nothing, and pdflatex and PIL can read it.
+    """
+    def chunk(kind, data):
+        return (struct.pack('>I', len(data)) + kind + data +
+                struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+    scanline = b'\x00' + b'\xff' * ((width + 7) // 8)
+    return (b'\x89PNG\r\n\x1a\n' +
+            chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 1, 0, 0, 0, 0)) +
+            chunk(b'IDAT', zlib.compress(scanline * height, 9)) +
+            chunk(b'IEND', b''))
+
+
+def make_listing(rng, npapers, authors, prefix='2401', staff=(), match_rate=0.):
+    """ Listing page of npapers, drawing authors from the given names
+
+    A fraction match_rate of the papers has a first author whose family
+    name is taken from staff. Returns the page and the authors of each
+    identifier.
+    """
+    items = ['<html><body><h3>New submissions for Mon, 1 Jan 24</h3><dl>']
+    papers = {}
+    for k in range(npapers):
+        identifier = '{0:s}.{1:05d}'.format(prefix, k)
+        papers[identifier] = [rng.choice(authors) for _ in range(rng.randint(1, 12))]
+        if staff and rng.random() < match_rate:
+            papers[identifier][0] = name(rng).split()[0] + ' ' + rng.choice(staff)
+        names = ', '.join('<a href="/a/{0:d}">{1:s}</a>'.format(k, author)
+                          for author in papers[identifier])
+        items.append(
+            '<dt><a name="item{0:d}">[{0:d}]</a> <span class="list-identifier">'
+            '<a href="/abs/{1:s}" title="Abstract">arXiv:{1:s}</a></span></dt>\n'
+            '<dd><div class="meta"><div class="list-title mathjax">'
+            '<span class="descriptor">Title:</span> {2:s}</div>\n'
+            '<div class="list-authors"><span class="descriptor">Authors:</span> {3:s}</div>\n'
+            '<div class="list-comments">Comments: 10 pages</div>\n'
+            '<p class="mathjax">{4:s}</p></div></dd>\n'.format(
+                k + 1, identifier, sentence(rng, 8), names, sentence(rng, 80)))
+    items.append('<h3>Replacements for Mon, 1 Jan 24</h3><dt></dt></dl></body></html>')
+    return ''.join(items), papers
+
+
+def make_abstract_page(rng, nauthors, authors=None):
+    """ abstract page of a paper with nauthors (or the given authors) """
+    if authors is None:
+        authors = [name(rng) for _ in range(nauthors)]
+    names = ', '.join('<a href="/search/?searchtype=author&query={0:d}">{1:s}</a>'.format(k, author)
+                      for k, author in enumerate(authors))
+    return ('<html><body><h1 class="title mathjax"><span class="descriptor">Title:</span>'
+            '{0:s}</h1><div class="authors">{1:s}</div>'
+            '<div class="dateline">[Submitted on 1 Jan 2024]</div>'
+            '<blockquote class="abstract mathjax">{2:s}</blockquote>'
+            '<table><tr><td class="tablecell comments mathjax">10 pages</td></tr></table>'
+            '</body></html>'.format(sentence(rng, 8), names, sentence(rng, 200)))
+
+
+def make_eprint(rng, fname, nsections, words=(), padding=0):
+    """ E-print tarball of a paper with nsections and its figures
+
+    Parameters
+    ----------
+    fname: str or file
+        where to write the tarball
+    words: seq(str)
+        words added to the affiliations (e.g., required institute words)
+    padding: int
+        incompressible bytes added to the figures in total
+    """
+    nfigures = nsections // 4 + 1
+    lines = [r'\documentclass{aa}', r'\usepackage{graphicx}']
+    lines.extend(r'\newcommand{{\macro{0:s}}}{{\mathrm{{{1:s}}}}}'.format(
+        chr(ord('a') + k % 26) * (k // 26 + 1), rng.choice(WORDS)) for k in range(20))
+    lines.extend([r'\begin{document}', r'\title{' + sentence(rng, 8) + '}',
+                  r'\author{' + r' \and '.join(name(rng) for _ in range(8)) + '}',
+                  r'\institute{' + ' '.join(words) + '}',
+                  r'\abstract{' + sentence(rng, 200) + '}', r'\maketitle'])
+    for k in range(nsections):
+        lines.append(r'\section{' + sentence(rng, 4) + '}')
+        for _ in range(3):
+            refs = ' '.join(r'Fig.~\ref{{fig:{0:d}}}'.format(rng.randrange(nfigures))
+                            for _ in range(2))
+            lines.append(sentence(rng, 60) + ' ' + refs + r' \citep{ref' + str(k) + '}.')
+            lines.append('% ' + sentence(rng, 10))
+        if k % 4 == 0:
+            number = k // 4
+            lines.extend([r'\begin{figure}', r'\centering',
+                          r'\includegraphics[width=\columnwidth]{{figures/fig{0:d}}}'.format(number),
+                          r'\caption{' + sentence(rng, 40) + '}',
+                          r'\label{{fig:{0:d}}}'.format(number), r'\end{figure}'])
+    lines.append(r'\end{document}')
+
+    if isinstance(fname, str):
+        tar = tarfile.open(fname, 'w:gz')
+    else:
+        tar = tarfile.open(fileobj=fname, mode='w:gz')
+    with tar:
+        def add(arcname, data):
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        add('main.tex', '\n'.join(lines).encode('utf8'))
+        for number in range(nfigures):
+            add('figures/fig{0:d}.png'.format(number),
+                png(rng.randint(400, 1600), rng.randint(400, 1600)) +
+                os.urandom(padding // nfigures))
+
+
+def best_time(func, repeat=5):
+    """ best wall time of calling func (its output is discarded) """
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(sizes, repeat=5, seed=42):
+    """ time every stage at every size
+
+    Returns
+    -------
+    results: dict
+        best time in seconds of "stage[size]"
+    """
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    template = mpia.MPIATemplate()
+    try:
+        for size in sizes:
+            rng = random.Random(seed + size)
+            authors = [name(rng) for _ in range(5 * size)]
+            mitarbeiter = sorted(set(author.split()[-1] for author in rng.sample(authors, size)))
+            listing, _ = make_listing(rng, size, authors)
+            abstract = make_abstract_page(rng, size)
+            eprint = os.path.join(workdir, 'eprint{0:d}.tar.gz'.format(size))
+            make_eprint(rng, eprint, size)
+            source = os.path.join(workdir, 'source{0:d}'.format(size))
+
+            def parse_listing():
+                parser = ArxivListHTMLParser(skip_replacements=True)
+                parser.feed(listing)
+                return parser.papers
+
+            def parse_abstract():
+                parser = ArxivAbstractHTMLParser()
+                parser.feed(abstract)
+
+            def extract():
+                shutil.rmtree(source, ignore_errors=True)
+                with tarfile.open(eprint, 'r:gz') as tar:
+                    tar.extractall(source)
+
+            papers = parse_listing()
+            extract()
+            with contextlib.redirect_stdout(io.StringIO()):
+                document = app.DocumentSource(source)
+                document._identifier = '2401.00001'
+                document.comment = 'comment'
+                document.date = 'today'
+
+            stages = (('listing parse', parse_listing),
+                      ('abstract parse', parse_abstract),
+                      ('author filter', lambda: app.filter_papers(papers, mitarbeiter)),
+                      ('eprint extract', extract),
+                      ('document source', lambda: app.DocumentSource(source)),
+                      ('figure selection', lambda: template.select_figures(document)),
+                      ('template render', lambda: template.apply_to_document(document)))
+            for stage, func in stages:
+                key = '{0:s}[{1:d}]'.format(stage, size)
+                results[key] = best_time(func, repeat)
+    finally:
+        shutil.rmtree(workdir)
+    return results
+
+
+def main():
+    from optparse import OptionParser
+    parser = OptionParser()
+    parser.add_option('--sizes', dest='sizes', default='10,100,1000', type='str',
+                      help='comma separated input sizes')
+    parser.add_option('-r', '--repeat', dest='repeat', default=5, type='int',
+                      help='number of runs of each measurement')
+    parser.add_option('--baseline', dest='baseline', type='str',
+                      default=os.path.join(__ROOT__, 'benchmarks', 'baseline.json'),
+                      help='timings to compare to')
+    parser.add_option('--save', dest='save', default=False, action='store_true',
+                      help='store the timings as the new baseline')
+    parser.add_option('--tolerance', dest='tolerance', default=0.25, type='float',
+                      help='tolerated relative slow down')
+    parser.add_option('--min-time', dest='min_time', default=1e-3, type='float',
+                      help='slow downs smaller than this (in seconds) are noise')
+    (options, args) = parser.parse_args()
+
+    sizes = [int(size) for size in options.sizes.split(',')]
+    results = run(sizes, options.repeat)
+
+    baseline = {}
+    if os.path.isfile(options.baseline) and not options.save:
+        with open(options.baseline) as fin:
+            baseline = json.load(fin)
+
+    failed = False
+    for key in sorted(results, key=lambda k: (k.split('[')[0], int(k.split('[')[1][:-1]))):
+        elapsed = results[key]
+        status = ''
+        if key in baseline:
+            reference = baseline[key]
+            status = '{0:+6.1f}%'.format(100. * (elapsed / reference - 1.))
+            if (elapsed > reference * (1. + options.tolerance) and
+                    elapsed - reference > options.min_time):
+                status += '  REGRESSION'
+                failed = True
+        print('{0:30s} {1:10.2f} ms  {2:s}'.format(key, 1e3 * elapsed, status))
+
+    if options.save:
+        with open(options.baseline, 'w') as fout:
+            json.dump(results, fout, indent=2, sort_keys=True)
+        print('baseline saved to', options.baseline)
+    sys.exit(int(failed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Startup time benchmark
+======================
+
+Guards the command line startup: importing `app` and `mpia` must not load
+the modules only needed to download, extract or compile papers, and the
+time spent importing them must stay small compared to the interpreter
+startup.
+
+    python benchmarks/bench_startup.py [--repeat 10] [--max-overhead 0.1]
+"""
+from __future__ import print_function
+import os
+import sys
+import subprocess
+import time
+
+__ROOT__ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# modules that should only be imported when first needed
+LAZY_MODULES = ('qrcode', 'PIL', 'tarfile', 'subprocess', 'html.parser',
+                'urllib.request', 'http.client', 'inspect', 'traceback')
+
+
+def best_time(code, repeat=10):
+    """ best wall time of running python code in a new interpreter """
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        subprocess.check_call([sys.executable, '-c', code], cwd=__ROOT__)
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def loaded_modules(code):
+    """ lazy modules that are loaded after running code """
+    check = code + ("\nimport sys\nprint(' '.join(m for m in {0!r} "
+                    "if m in sys.modules))").format(LAZY_MODULES)
+    output = subprocess.check_output([sys.executable, '-c', check], cwd=__ROOT__)
+    return output.decode('utf8').split()
+
+
+def main():
+    from optparse import OptionParser
+    parser = OptionParser()
+    parser.add_option('-r', '--repeat', dest='repeat', default=10, type='int',
+                      help='number of runs of each measurement')
+    parser.add_option('--max-overhead', dest='max_overhead', default=0.1,
+                      type='float', help='tolerated import time in seconds')
+    (options, args) = parser.parse_args()
+
+    failed = False
+    baseline = best_time('pass', options.repeat)
+    print('{0:30s} {1:8.1f} ms'.format('python', 1e3 * baseline))
+    for name, code in (('import app', 'import app'),
+                       ('import mpia', 'import mpia'),
+                       ('mpia templates', 'import mpia, main')):
+        elapsed = best_time(code, options.repeat)
+        overhead = elapsed - baseline
+        loaded = loaded_modules(code)
+        status = 'ok'
+        if overhead > options.max_overhead:
+            status = 'TOO SLOW'
+            failed = True
+        if loaded:
+            status = 'LOADS ' + ','.join(loaded)
+            failed = True
+        print('{0:30s} {1:8.1f} ms  (+{2:6.1f} ms)  {3:s}'.format(
+            name, 1e3 * elapsed, 1e3 * overhead, status))
+    sys.exit(int(failed))
+
+
+if __name__ == "__main__":
+    main()
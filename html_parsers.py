@@ -0,0 +1,119 @@
+"""
+HTML parsers of the ArXiv pages
+===============================
+
+Kept apart from `app` so that html.parser is only imported when a page is
+actually parsed.
+"""
+from html.parser import HTMLParser
+
+from app import ArXivPaper, tex_escape
+
+
+class ArxivAbstractHTMLParser(HTMLParser):
+    """ generates a list of Paper items by parsing the Arxiv new page """
+
+    def __init__(self, *args, **kwargs):
+        HTMLParser.__init__(self, *args, **kwargs)
+        self.current_paper = None
+        self._paper_item = False
+        self._title_tag = False
+        self._author_tag = False
+        self._abstract_tag = False
+        self._comment_tag = False
+        self.title = None
+        self.comment = None
+        self.date = None
+        self.authors = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'h1':
+            self._title_tag = True
+        if (tag == 'a') & (len(attrs) > 0):
+            if "searchtype=author" in attrs[0][1]:
+            # if '/find/astro-ph/1/au:' in attrs[0][1]:
+                self._author_tag = True
+        if tag == 'blockquote':
+            self._abstract_tag = True
+        try:
+            if tag == 'td' and 'tablecell comments' in attrs[0][1]:
+                self._comment_tag = True
+        except IndexError:
+            pass
+
+    def handle_endtag(self, tag):
+        if tag == 'h1':
+            self._title_tag = False
+        if tag == 'a':
+            self._author_tag = False
+        if tag == 'blockquote':
+            self._abstract_tag = False
+
+    def handle_data(self, data):
+        if self._title_tag and ('Title:' not in data):
+            self.title = data.replace('\n', ' ').strip()
+        if self._author_tag:
+            self.authors.append(data)
+        if self._abstract_tag:
+            self.abstract = data.strip()
+        if self._comment_tag:
+            # self.comment = re.escape(data.strip())
+            self.comment = tex_escape(data.strip())
+            # self.comment = data.strip()
+            self._comment_tag = False
+        if 'Submitted on' in data:
+            self.date = data.strip()
+
+
+class ArxivListHTMLParser(HTMLParser):
+    """ generates a list of Paper items by parsing the Arxiv new page """
+
+    def __init__(self, *args, **kwargs):
+        skip_replacements = kwargs.pop('skip_replacements', False)
+        HTMLParser.__init__(self, *args, **kwargs)
+        self.papers = []
+        self.current_paper = None
+        self._paper_item = False
+        self._title_tag = False
+        self._author_tag = False
+        self.skip_replacements = skip_replacements
+        self._skip = False
+        self._date = kwargs.pop('appearedon', '')
+
+    def handle_starttag(self, tag, attrs):
+        # paper starts with a dt tag
+        if (tag in ('dt') and not self._skip):
+            if self.current_paper:
+                self.papers.append(self.current_paper)
+            self._paper_item = True
+            self.current_paper = ArXivPaper(appearedon=self._date)
+
+    def handle_endtag(self, tag):
+        # paper ends with a /dd tag
+        if tag in ('dd'):
+            self._paper_item = False
+        if tag in ('div',) and self._author_tag:
+            self._author_tag = False
+        if tag in ('div',) and self._title_tag:
+            self._title_tag = False
+
+    def handle_data(self, data):
+        if data.strip() in (None, "", ','):
+            return
+        if 'replacements for' in data.lower():
+            self._skip = (True & self.skip_replacements)
+        if 'new submissions for' in data.lower():
+            self._date = data.lower().replace('new submissions for', '')
+        if self._paper_item:
+            if 'arXiv:' in data:
+                self.current_paper.identifier = data
+            if self._title_tag:
+                self.current_paper.title = data.replace('\n', '')
+                self._title_tag = False
+            if self._author_tag:
+                self.current_paper._authors.append(data.replace('\n', ''))
+                self._title_tag = False
+            if 'Title:' in data:
+                self._title_tag = True
+            if 'Authors:' in data:
+                self._author_tag = True
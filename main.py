@@ -4,14 +4,14 @@ A quick and dirty parser for ArXiv
 
 Default running application
 """
-from app import (ExportPDFLatexTemplate)
+from app import (ExportPDFLatexTemplate, TemplateFile, __ROOT__)
 
 
 class DefaultTemplate(ExportPDFLatexTemplate):
 
-    template = open('./default.tpl', 'r').read()
+    template = TemplateFile('default.tpl')
 
-    compiler = r"TEXINPUTS='../deprecated_tex:' pdflatex"
+    compiler = r"TEXINPUTS='{0:s}/deprecated_tex:' pdflatex".format(__ROOT__)
     compiler_options = r"-enable-write18 -shell-escape -interaction=nonstopmode"
 
     def short_authors(self, document):
@@ -29,55 +29,48 @@ class DefaultTemplate(ExportPDFLatexTemplate):
 
     def apply_to_document(self, document):
 
-        txt = self.template.replace('<MACROS>', document._macros)
-        if document._identifier is not None:
-            txt = txt.replace('<IDENTIFIER>',
-                              r'\hl{{{0:s}}}'.format(document._identifier) or 'Abstract ')
-        else:
-            txt = txt.replace('<IDENTIFIER>', 'Abstract ')
-        txt = txt.replace('<TITLE>', document.title)
-        txt = txt.replace('<AUTHORS>', self.short_authors(document))
-        txt = txt.replace('<ABSTRACT>', document.abstract.replace(r'\n', ' '))
+        values = {'MACROS': document._macros,
+                  'IDENTIFIER': self.format_identifier(document),
+                  'TITLE': document.title,
+                  'AUTHORS': self.short_authors(document),
+                  'ABSTRACT': document.abstract.replace(r'\n', ' '),
+                  'FIGURE_TWO': '', 'CAPTION_TWO': '',
+                  'FIGURE_THREE': '', 'CAPTION_THREE': '',
+                  'COMMENTS': document.comment or '',
+                  'DATE': document.date}
 
         for where, figure in zip('ONE TWO THREE'.split(),
                                  self.select_figures(document, N=3)):
             fig, caption = self.figure_to_latex(figure)
             if where == 'ONE':
                 special = fig.replace(r"[width=\maxwidth, height=\maxheight,keepaspectratio]", "")
-                txt = txt.replace('<FILE_FIGURE_ONE>', special)
-            fig = fig.replace(r'\\', '')
-            txt = txt.replace('<FIGURE_{0:s}>'.format(where), fig)
-            txt = txt.replace('<CAPTION_{0:s}>'.format(where), caption)
-        if '<CAPTION_TWO>' in txt:
-            txt = txt.replace('<FIGURE_TWO>', '')
-            txt = txt.replace('<CAPTION_TWO>', '')
-        if '<CAPTION_THREE>' in txt:
-            txt = txt.replace('<FIGURE_THREE>', '')
-            txt = txt.replace('<CAPTION_THREE>', '')
+                values['FILE_FIGURE_ONE'] = special
+            values['FIGURE_' + where] = fig.replace(r'\\', '')
+            values['CAPTION_' + where] = caption
 
-        txt = txt.replace('<COMMENTS>', document.comment or '')
-        txt = txt.replace('<DATE>', document.date)
-
-        return txt
+        return self.renderer.render(values)
 
 
 def main(template=None):
     from app import (get_mitarbeiter, filter_papers, ArXivPaper,
-            highlight_papers, running_options, get_new_papers, shutil)
+            highlight_papers, running_options, get_new_papers, shutil,
+            configure_downloads)
     options = running_options()
+    configure_downloads(options)
     identifier = options.get('identifier', None)
     paper_request_test = (identifier not in (None, 'None', '', 'none'))
     hl_authors = options.get('hl_authors', None)
     hl_request_test = (hl_authors not in (None, 'None', '', 'none'))
 
     if not hl_request_test:
-        mitarbeiter_list = options.get('mitarbeiter', './mitarbeiter.txt')
+        mitarbeiter_list = options.get('mitarbeiter', __ROOT__ + '/mitarbeiter.txt')
         mitarbeiter = get_mitarbeiter(mitarbeiter_list)
     else:
         mitarbeiter = [author.strip() for author in hl_authors.split(',')]
 
     if identifier in (None, '', 'None'):
-        papers = get_new_papers(skip_replacements=True)
+        papers = get_new_papers(skip_replacements=True,
+                                archives=options.get('archives', 'astro-ph').split(','))
         keep = filter_papers(papers, mitarbeiter)
     else:
         papers = [ArXivPaper(identifier=identifier.split(':')[-1])]
@@ -87,11 +80,11 @@ def main(template=None):
         print(paper)
         try:
             paper.get_abstract()
-            s = paper.retrieve_document_source('./tmp')
+            s = paper.retrieve_document_source(__ROOT__ + '/tmp')
             s.compile(template=template)
             _identifier = paper.identifier.split(':')[-1]
             name = s.outputname.replace('.tex', '.pdf').split('/')[-1]
-            shutil.move('./tmp/' + name, _identifier + '.pdf')
+            shutil.move(__ROOT__ + '/tmp/' + name, _identifier + '.pdf')
             print("PDF postage:", _identifier + '.pdf' )
         except Exception as error:
             print(error, '\n')
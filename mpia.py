@@ -4,14 +4,12 @@ A quick and dirty parser for ArXiv
 ===================================
 
 """
-import sys,time
-import traceback
+import sys
 from app import (ExportPDFLatexTemplate, DocumentSource, raise_or_warn,\
-        color_print, __DEBUG__)
+        color_print, TemplateFile, __DEBUG__)
 import os
-import inspect
 #directories
-__ROOT__ = '/'.join(os.path.abspath(inspect.getfile(inspect.currentframe())).split('/')[:-1])
+__ROOT__ = os.path.dirname(os.path.abspath(__file__))
 
 # Cron jobs need absolute file paths
 
@@ -22,12 +20,15 @@ class MPIATemplate(ExportPDFLatexTemplate):
     which shows 3 figures and adapt the layout depending of figure aspect ratios
     """
 
-    template = open(mpia_tpl, 'r').read()
+    template = TemplateFile(mpia_tpl)
 
     # Include often missing libraries
     compiler = r"TEXINPUTS='{0:s}/deprecated_tex:' pdflatex ".format(__ROOT__)
     compiler_options = r" -enable-write18 -shell-escape -interaction=nonstopmode "
 
+    # dump the package loading part of mpia.tpl into a format once
+    precompile_preamble = True
+
     def short_authors(self, document):
         """ How to return short version of author list 
 
@@ -41,7 +42,8 @@ class MPIATemplate(ExportPDFLatexTemplate):
         short_authors: string
             representation of the authors
         """
-        print(document.short_authors)
+        if document.verbose:
+            print(document.short_authors)
         return document.short_authors
 
     def figure_to_latex(self, figure):
@@ -58,6 +60,34 @@ class MPIATemplate(ExportPDFLatexTemplate):
         caption = r"""    \caption{Fig. """ + str(figure._number) + """: """ + str(figure.caption) + r"""}"""
         return fig, caption
 
+    # aspect ratio above which the first figure gets the landscape layout
+    landscape_ratio = 1.2
+
+    def layout_to_latex(self, figure, special):
+        """ Choose the layout from the first figure aspect ratio
+
+        The ratio is known from the file headers most of the time, otherwise
+        latex measures the figure.
+
+        Parameters
+        ----------
+        figure: app.Figure instance
+            first figure
+        special: string
+            latex code of the figure without size constraints
+
+        Returns
+        -------
+        txt: string
+            latex code setting \pgfmathresult to 1 for landscape, 0 otherwise
+        """
+        ratio = figure.aspect_ratio
+        if ratio is not None:
+            return r'\def\pgfmathresult{{{0:d}}}'.format(int(ratio > self.landscape_ratio))
+        txt = r'\savebox{\boxFigOne}{' + special + '}\n'
+        txt += r'\pgfmathparse{{\the\wd\boxFigOne/\the\ht\boxFigOne > {0:g} ? int(1):int(0)}}'.format(self.landscape_ratio)
+        return txt
+
     def apply_to_document(self, document):
         """ Fill the template 
 
@@ -71,44 +101,384 @@ class MPIATemplate(ExportPDFLatexTemplate):
         txt: string
             latex source of the final document
         """
-        txt = self.template.replace('<MACROS>', document._macros)
-        if document._identifier is not None:
-            txt = txt.replace('<IDENTIFIER>',
-                              r'\hl{{{0:s}}}'.format(document._identifier) or 'Abstract ')
-        else:
-            txt = txt.replace('<IDENTIFIER>', 'Abstract ')
-        txt = txt.replace('<TITLE>', document.title)
-        txt = txt.replace('<AUTHORS>', self.short_authors(document))
-        txt = txt.replace('<ABSTRACT>', document.abstract.replace(r'\n', ' '))
+        values = {'MACROS': document._macros,
+                  'IDENTIFIER': self.format_identifier(document),
+                  'QRCODE': self.qrcode_to_latex(document),
+                  'TITLE': document.title,
+                  'AUTHORS': self.short_authors(document),
+                  'ABSTRACT': document.abstract.replace(r'\n', ' '),
+                  'FIGURE_ONE': '', 'CAPTION_ONE': '',
+                  # portrait layout when there is no figure
+                  'FIGURE_ONE_LAYOUT': r'\def\pgfmathresult{0}',
+                  'FIGURE_TWO': '', 'CAPTION_TWO': '',
+                  'FIGURE_THREE': '', 'CAPTION_THREE': '',
+                  'COMMENTS': document.comment or '',
+                  'DATE': document.date}
 
         for where, figure in zip('ONE TWO THREE'.split(),
                                  self.select_figures(document, N=3)):
             fig, caption = self.figure_to_latex(figure)
             if where == 'ONE':
                 special = fig.replace(r"[width=\maxwidth, height=\maxheight,keepaspectratio]", "")
-                txt = txt.replace('<FILE_FIGURE_ONE>', special)
-            fig = fig.replace(r'\\', '')
-            txt = txt.replace('<FIGURE_{0:s}>'.format(where), fig)
-            txt = txt.replace('<CAPTION_{0:s}>'.format(where), caption)
-        if '<CAPTION_TWO>' in txt:
-            txt = txt.replace('<FIGURE_TWO>', '')
-            txt = txt.replace('<CAPTION_TWO>', '')
-        if '<CAPTION_THREE>' in txt:
-            txt = txt.replace('<FIGURE_THREE>', '')
-            txt = txt.replace('<CAPTION_THREE>', '')
-
-        txt = txt.replace('<COMMENTS>', document.comment or '')
-        txt = txt.replace('<DATE>', document.date)
+                values['FILE_FIGURE_ONE'] = special
+                values['FIGURE_ONE_LAYOUT'] = self.layout_to_latex(figure, special)
+            values['FIGURE_' + where] = fig.replace(r'\\', '')
+            values['CAPTION_' + where] = caption
 
-        return txt
+        return self.renderer.render(values)
+
+
+class Group(object):
+    """ People a set of postages is made for
+
+    Parameters
+    ----------
+    name: str
+        name of the group (used in the reports)
+    mitarbeiter: list(str)
+        authors to look for (see app.get_mitarbeiter)
+    words: seq(str)
+        words that must all appear in the paper source
+    template: ExportPDFLatexTemplate
+        template of the postages
+    output: str
+        directory receiving the postages
+    staff: str
+        file the authors were read from (see refresh)
+    """
+    def __init__(self, name, mitarbeiter, words=(), template=None, output=__ROOT__,
+                 staff=None):
+        self.name = name
+        self.mitarbeiter = mitarbeiter
+        self.words = list(words)
+        self.template = template
+        self.output = output
+        self.staff = staff
+        self._staff_mtime = os.path.getmtime(staff) if staff else None
+        # highlighted authors of the matching papers, by identifier
+        self.matches = {}
+        self.booklet_documents = []
+
+    def refresh(self):
+        """ Read the authors again if the staff file changed since they were read
+
+        Returns
+        -------
+        changed: bool
+            whether the authors were read again
+        """
+        from app import get_mitarbeiter
+        if self.staff is None:
+            return False
+        mtime = os.path.getmtime(self.staff)
+        if mtime == self._staff_mtime:
+            return False
+        self.mitarbeiter = get_mitarbeiter(self.staff)
+        self._staff_mtime = mtime
+        return True
+
+    def __repr__(self):
+        return 'Group {0:s}: {1:d} authors, words {2:s}'.format(
+            self.name, len(self.mitarbeiter), ', '.join(self.words))
+
+
+def load_template(spec):
+    """ Instantiate a template given as "module:Class" (e.g., mpia:MPIATemplate) """
+    import importlib
+    module, _, name = spec.partition(':')
+    return getattr(importlib.import_module(module), name)()
+
+
+def get_groups(fname, template=None):
+    """ Read group definitions from an ini file
+
+    Each section defines a group::
+
+        [mpia]
+        mitarbeiter = mitarbeiter.txt
+        words = Heidelberg, Max, Planck, 69117
+        template = mpia:MPIATemplate
+        output = postages/mpia
+
+    Relative paths are relative to the file. Groups without template use
+    the given one and groups sharing a template share its instance.
+
+    Parameters
+    ----------
+    fname: str
+        configuration file
+    template: ExportPDFLatexTemplate
+        default template
+
+    Returns
+    -------
+    groups: list(Group)
+        groups in the order of the file
+    """
+    import configparser
+    from app import get_mitarbeiter
+    config = configparser.ConfigParser()
+    with open(fname) as fin:
+        config.read_file(fin)
+    where = os.path.dirname(os.path.abspath(fname))
+    templates = {}
+    groups = []
+    for name in config.sections():
+        section = config[name]
+        spec = section.get('template', '')
+        if spec and spec not in templates:
+            templates[spec] = load_template(spec)
+        output = os.path.join(where, section.get('output', name))
+        if not os.path.isdir(output):
+            os.makedirs(output)
+        words = [word.strip() for word in section.get('words', '').split(',')]
+        staff = os.path.join(where, section['mitarbeiter'])
+        groups.append(Group(name, get_mitarbeiter(staff),
+                            words=[word for word in words if word],
+                            template=templates.get(spec, template),
+                            output=output, staff=staff))
+    return groups
+
+
+def read_seen(fname):
+    """ Identifiers listed in a file, one per line (none if it does not exist) """
+    if not os.path.exists(fname):
+        return set()
+    with open(fname) as fin:
+        return set(line.strip() for line in fin if line.strip())
+
+
+def add_seen(fname, identifiers):
+    """ Append identifiers to a file, one per line """
+    if not identifiers:
+        return
+    directory = os.path.dirname(fname)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(fname, 'a') as fout:
+        fout.writelines(identifier + '\n' for identifier in sorted(identifiers))
+
+
+def process_papers(papers, groups, select, booklet=False, force=False,
+                   seen=None, debug=False, **options):
+    """ Make the postages of the papers matching the groups
+
+    The papers are matched against every group and the source of each
+    matching paper is fetched once.
+
+    Parameters
+    ----------
+    papers: iterable(ArXivPaper)
+        papers (e.g., a listing, possibly a stream)
+    groups: list(Group)
+        groups the postages are made for
+    select: callable
+        app.filter_papers or app.highlight_papers
+    booklet: bool
+        set to collect the documents in group.booklet_documents instead of
+        compiling them
+    force: bool
+        set to make postages of papers without the words of the group
+    seen: set(str)
+        identifiers of the papers already processed, which are skipped.
+        Papers are added once settled: without matching author, or with a
+        group that made its postage or rejected it on its words. Papers
+        that failed otherwise (e.g., download or compilation errors) are
+        not added.
+    debug: bool
+        set to raise exceptions on errors
+    options: dict
+        arguments of Document.compile (e.g., optimize_figures, workspace, cache)
+
+    Returns
+    -------
+    issues: list(tuple)
+        group, identifier, highlighted authors and error of the failures
+    non_issues: list(tuple)
+        group, identifier and highlighted authors of the postages
+    matched_authors: list(tuple)
+        group, name, author and identifier of the author matches
+    """
+    import copy
+    import shutil
+    from app import check_required_words, TRACER
+
+    # The listing may be a stream: only the matching papers are kept.
+    matched_authors = []
+    candidates = {}
+    for paper in papers:
+        if seen is not None and paper.identifier in seen:
+            continue
+        for group in groups:
+            keep, matched = select([paper], group.mitarbeiter)
+            for match in keep:
+                group.matches[match.identifier] = list(match.highlight_authors)
+                candidates.setdefault(match.identifier, match)
+            matched_authors.extend((group.name, name, author, pid)
+                                   for name, author, pid in matched)
+        if seen is not None and paper.identifier not in candidates:
+            seen.add(paper.identifier)
+
+    issues = []
+    non_issues = []
+
+    for paper in candidates.values():
+        print(paper)
+        _identifier = paper.identifier.split(':')[-1]
+        with TRACER.context(paper=_identifier):
+            try:
+                if booklet:
+                    # papers of a booklet need their own directories
+                    s = paper.retrieve_document_source(__ROOT__ + '/tmp/' + _identifier)
+                else:
+                    s = paper.retrieve_document_source(__ROOT__ + '/tmp/')
+            except Exception as error:
+                for group in groups:
+                    if paper.identifier in group.matches:
+                        issues.append((group.name, paper.identifier,
+                                       ', '.join(group.matches[paper.identifier]), str(error)))
+                raise_or_warn(error, debug=debug)
+                continue
+
+            settled = False
+            for group in groups:
+                if paper.identifier not in group.matches:
+                    continue
+                # authors are highlighted for each group on its own copy
+                # (with its own figures, see DocumentSource.__copy__)
+                paper.highlight_authors = group.matches[paper.identifier]
+                document = copy.copy(s)
+                document._authors = paper.authors
+                document._short_authors = paper.short_authors
+                with TRACER.context(group=group.name):
+                    try:
+                        institute_test = check_required_words(document, group.words)
+                        color_print("\n**** From {0:s}: {1:s}\n".format(group.name, str(institute_test)), 'GREEN')
+                        # Filtering out bad matches
+                        if (not institute_test) and (not force):
+                            settled = True
+                            raise RuntimeError('Not an institute paper -- ' +
+                                    check_required_words(document, group.words, verbose=True))
+                        if booklet:
+                            group.booklet_documents.append(document)
+                        else:
+                            pdf = document.compile(template=group.template, **options)
+                            if pdf is None:
+                                raise RuntimeError('Compilation failed -- ' + str(document.compile_result))
+                            destination = os.path.join(group.output, _identifier + '.pdf')
+                            shutil.move(pdf, destination)
+                            print("PDF postage:", destination)
+                        non_issues.append((group.name, paper.identifier, ', '.join(paper.highlight_authors)))
+                        settled = True
+                    except Exception as error:
+                        issues.append((group.name, paper.identifier, ', '.join(paper.highlight_authors), str(error)))
+                        raise_or_warn(error, debug=debug)
+            if settled and seen is not None:
+                seen.add(paper.identifier)
+    return issues, non_issues, matched_authors
+
+
+def print_reports(issues, non_issues, matched_authors):
+    """ Print the outcome of process_papers """
+    from app import TRACER
+
+    print(""" Issues =============================== """)
+    for issue in issues:
+        color_print("[{0:s}] [{1:s}] {2:s} \n {3:s}".format(*issue), 'red')
+
+    print(""" Matched Authors ====================== """)
+    for group_name, name, author, pid in matched_authors:
+        color_print("[{0:s}] [{1:s}] {2:10s} {3:s}".format(group_name, pid, name, author), 'green')
+
+    print(""" Compiled outputs ===================== """)
+    for issue in non_issues:
+        color_print("[{0:s}] [{1:s}] {2:s}".format(*issue), 'cyan')
+
+    print(""" Stages =============================== """)
+    TRACER.print_summary()
+
+
+def run_daemon(groups, archives=('astro-ph',), interval=10., polls=0,
+               seen_file=None, retries=3, debug=False, **options):
+    """ Stay resident and make the postages of the new papers at every poll
+
+    Everything a single run sets up is kept between the polls: the groups
+    with their staff lists and templates (and the precompiled preambles),
+    the HTTP connections (see app.use_keep_alive) and the caches of the
+    process, so that a poll only costs the listing and the new papers.
+    Staff files changed on disk are read again before a poll. Papers that
+    failed (see process_papers) are tried again at the next polls, up to
+    retries times.
+
+    Parameters
+    ----------
+    groups: list(Group)
+        groups the postages are made for
+    archives: seq(str)
+        arxiv archives to list
+    interval: float
+        minutes between the starts of two polls
+    polls: int
+        number of polls before returning (0: no limit)
+    seen_file: str
+        file of the identifiers already processed, kept across restarts
+    retries: int
+        number of polls a failing paper is tried at
+    debug: bool
+        set to raise exceptions on errors
+    options: dict
+        arguments of Document.compile (e.g., optimize_figures, workspace, cache)
+    """
+    import time
+    from app import get_new_papers, filter_papers, use_keep_alive, TRACER
+
+    use_keep_alive()
+    seen = read_seen(seen_file) if seen_file else set()
+    # failed polls of the papers not settled yet, by identifier
+    failures = {}
+    count = 0
+    while True:
+        start = time.time()
+        count += 1
+        color_print("\n**** Poll {0:d} at {1:s}, {2:d} papers seen\n".format(
+            count, time.strftime('%Y-%m-%d %H:%M:%S'), len(seen)), 'GREEN')
+        before = set(seen)
+        try:
+            for group in groups:
+                if group.refresh():
+                    print("Staff of {0:s} read again: {1:d} authors".format(
+                        group.name, len(group.mitarbeiter)))
+                group.matches = {}
+            papers = get_new_papers(skip_replacements=True, archives=archives)
+            issues, non_issues, matched_authors = process_papers(
+                papers, groups, filter_papers, seen=seen, debug=debug, **options)
+            print_reports(issues, non_issues, matched_authors)
+            for identifier in set(issue[1] for issue in issues) - seen:
+                failures[identifier] = failures.get(identifier, 0) + 1
+                if failures[identifier] >= retries:
+                    del failures[identifier]
+                    color_print("Giving up {0:s} after {1:d} polls".format(
+                        identifier, retries), 'red')
+                    seen.add(identifier)
+        except Exception as error:
+            # e.g., the listing is down: try again at the next poll
+            raise_or_warn(error, debug=debug)
+        finally:
+            if seen_file:
+                add_seen(seen_file, seen - before)
+            TRACER.reset()
+        if polls and count >= polls:
+            return
+        time.sleep(max(0., 60 * interval - (time.time() - start)))
 
 
 def main(template=None):
     """ Main function """
     from app import (get_mitarbeiter, filter_papers, ArXivPaper,
                      highlight_papers, running_options, get_new_papers,
-                     shutil, get_catchup_papers, check_required_words, check_date,
-                     make_qrcode)
+                     shutil, get_catchup_papers, iter_catchup_papers, check_date,
+                     compile_booklet, TRACER, configure_downloads,
+                     parse_date, local_identifiers, rerender_papers)
     options = running_options()
     identifier = options.get('identifier', None)
     paper_request_test = (identifier not in (None, 'None', '', 'none'))
@@ -117,84 +487,130 @@ def main(template=None):
     sourcedir = options.get('sourcedir', None)
     catchup_since = options.get('since', None)
     select_main = options.get('select_main', False)
+    optimize_figures = options.get('optimize_figures', False)
+    workspace = options.get('workspace', False)
+    cache = options.get('cache', True)
+    groups_file = options.get('groups', '')
+    archives = options.get('archives', 'astro-ph').split(',')
+    configure_downloads(options)
+    booklet = options.get('booklet', '')
+    if options.get('daemon') and booklet:
+        raise ValueError('--daemon makes postages as papers appear, not booklets')
 
     __DEBUG__ = options.get('debug', False)
 
     if __DEBUG__:
         print('Debug mode on')
 
+    if options.get('trace'):
+        TRACER.open(options['trace'])
+
+    staff = None
     if not hl_request_test:
-        mitarbeiter_list = options.get('mitarbeiter', __ROOT__ + '/mitarbeiter.txt')
-        mitarbeiter = get_mitarbeiter(mitarbeiter_list)
+        staff = options.get('mitarbeiter', __ROOT__ + '/mitarbeiter.txt')
+        mitarbeiter = get_mitarbeiter(staff)
     else:
         mitarbeiter = [author.strip() for author in hl_authors.split(',')]
 
+    institute_words = ['Heidelberg', 'Max', 'Planck', '69117']
+
+    if groups_file:
+        groups = get_groups(groups_file, template=template)
+    else:
+        groups = [Group('Heidelberg', mitarbeiter, institute_words, template, staff=staff)]
+    if options.get('timeout'):
+        for group in groups:
+            if group.template is not None:
+                group.template.compile_timeout = options['timeout']
+
+    if options.get('daemon'):
+        try:
+            run_daemon(groups, archives=archives,
+                       interval=options.get('interval', 10.),
+                       polls=options.get('polls', 0),
+                       seen_file=options.get('seen'), debug=__DEBUG__,
+                       optimize_figures=optimize_figures,
+                       workspace=workspace, cache=cache)
+        except KeyboardInterrupt:
+            print('Daemon stopped')
+        finally:
+            TRACER.close()
+        return
+
+    if options.get('rerender'):
+        if options.get('template'):
+            template = load_template(options['template'])
+            if options.get('timeout'):
+                template.compile_timeout = options['timeout']
+        identifiers = []
+        for item in options['rerender'].split(','):
+            try:
+                identifiers.extend(local_identifiers([parse_date(item)]))
+            except ValueError:
+                identifiers.append(item.strip())
+        results = rerender_papers(identifiers, template=template,
+                                  mitarbeiter=mitarbeiter, output=__ROOT__,
+                                  max_workers=options.get('jobs', 4),
+                                  optimize_figures=optimize_figures,
+                                  workspace=workspace, cache=cache)
+        print(""" Rebuilt postages ===================== """)
+        for identifier, pdf, error in results:
+            if pdf is None:
+                color_print("[{0:s}] {1:s}".format(identifier, error), 'red')
+            else:
+                color_print("[{0:s}] {1:s}".format(identifier, pdf), 'cyan')
+        print(""" Stages =============================== """)
+        TRACER.print_summary()
+        TRACER.close()
+        return
+
     if sourcedir not in (None, ''):
         paper = DocumentSource(sourcedir, autoselect=(not select_main))
         paper.identifier = sourcedir
         keep, matched_authors = highlight_papers([paper], mitarbeiter)
-        paper.compile(template=template)
-        name = paper.outputname.replace('.tex', '.pdf').split('/')[-1]
-        shutil.move(sourcedir + '/' + name, paper.identifier + '.pdf')
+        pdf = paper.compile(template=template, optimize_figures=optimize_figures,
+                            workspace=workspace, cache=cache)
+        if pdf is None:
+            raise RuntimeError('Compilation failed -- ' + str(paper.compile_result))
+        shutil.move(pdf, paper.identifier + '.pdf')
         print("PDF postage:", paper.identifier + '.pdf' )
-        return 
+        return
     elif identifier in (None, '', 'None'):
-        if catchup_since not in (None, '', 'None', 'today'):
-            papers = get_catchup_papers(since=catchup_since, skip_replacements=True)
+        if options.get('until'):
+            papers = iter_catchup_papers(since=catchup_since or None,
+                                         until=options['until'],
+                                         skip_replacements=True, archives=archives)
+        elif catchup_since not in (None, '', 'None', 'today'):
+            papers = get_catchup_papers(since=catchup_since, skip_replacements=True,
+                                        archives=archives)
         else:
-            papers = get_new_papers(skip_replacements=True, appearedon=check_date(options.get('date')))
-        keep, matched_authors = filter_papers(papers, mitarbeiter)
+            papers = get_new_papers(skip_replacements=True, appearedon=check_date(options.get('date')),
+                                    archives=archives)
+        select = filter_papers
     else:
         papers = [ArXivPaper(identifier=identifier.split(':')[-1], appearedon=check_date(options.get('date')))]
-        keep, matched_authors = highlight_papers(papers, mitarbeiter)
+        select = highlight_papers
 
-    institute_words = ['Heidelberg', 'Max', 'Planck', '69117']
+    issues, non_issues, matched_authors = process_papers(
+        papers, groups, select, booklet=bool(booklet), force=paper_request_test,
+        debug=__DEBUG__, optimize_figures=optimize_figures,
+        workspace=workspace, cache=cache)
 
-    # make sure no duplicated papers
-    keep = {k.identifier: k for k in keep}.values()
-    
-    issues = []
-    non_issues = []
-        
-    for paper in keep:
-        print(paper)
-        try:
-            paper.get_abstract()
-            s = paper.retrieve_document_source(__ROOT__ + '/tmp/')
-            institute_test = check_required_words(s, institute_words)
-            color_print("\n**** From Heidelberg: " + str(institute_test) + '\n', 'GREEN')
-            _identifier = paper.identifier.split(':')[-1]
-            # Filtering out bad matches
-            if (not institute_test) and (not paper_request_test):
-                raise RuntimeError('Not an institute paper -- ' +
-                        check_required_words(s, institute_words, verbose=True))
-            if (paper_request_test or institute_test):
-                # Generate a QR Code
-                make_qrcode(_identifier)
-                s.compile(template=template)
-                name = s.outputname.replace('.tex', '.pdf').split('/')[-1]
-                destination = __ROOT__ + '/' + _identifier + '.pdf'
-                time.sleep(2)
-                shutil.move(__ROOT__ + '/tmp/' + name, destination)
-                print("PDF postage:", _identifier + '.pdf' )
-            else:
-                print("Not from HD... Skip.")
-            non_issues.append((paper.identifier, ', '.join(paper.highlight_authors)))
-        except Exception as error:
-            issues.append((paper.identifier, ', '.join(paper.highlight_authors), str(error)))
-            raise_or_warn(error, debug=__DEBUG__)
+    for group in groups:
+        if not group.booklet_documents:
+            continue
+        output = booklet
+        if groups_file:
+            # one booklet per group, even if the given path is absolute
+            output = os.path.join(group.output, os.path.basename(booklet))
+        outputs = compile_booklet(group.booklet_documents, template=group.template,
+                                  output=output,
+                                  split=options.get('split_booklet', False))
+        for output in outputs:
+            print("PDF booklet:", output)
 
-    print(""" Issues =============================== """)
-    for issue in issues:
-        color_print("[{0:s}] {1:s} \n {2:s}".format(*issue), 'red')
-
-    print(""" Matched Authors ====================== """)
-    for name, author, pid in matched_authors:
-        color_print("[{0:s}] {1:10s} {2:s}".format(pid, name, author), 'green')
-
-    print(""" Compiled outputs ===================== """)
-    for issue in non_issues:
-        color_print("[{0:s}] {1:s}".format(*issue), 'cyan')
+    print_reports(issues, non_issues, matched_authors)
+    TRACER.close()
 
 
 if __name__ == "__main__":
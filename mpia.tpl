@@ -26,7 +26,7 @@
 \usepackage{xparse} 
 \usepackage{xspace} 
 % \usepackage{fontspec}
-\usepackage{../deprecated_tex/astrojournals}
+\usepackage{astrojournals}
 \usepackage[Symbol]{upgreek}
 
 % Making fitbox environment ----------------------------------------------------
@@ -299,7 +299,7 @@
                 \begin{wrapfigure}{r}{0.1\textwidth}
                 \vspace{-.4cm}
                 \hspace{-.2cm}
-                \includegraphics[width=0.1\textwidth]{qrcode.pdf}
+                <QRCODE>
                 \vspace{-.5cm}
                 \end{wrapfigure}
 
@@ -335,14 +335,16 @@
 % |    |    |
 % -----------
 
+% decided in python when the figure size is known, otherwise
 % store the figure into a box to retrieve properties
-\savebox{\boxFigOne}{<FILE_FIGURE_ONE>}
+% \savebox{\boxFigOne}{...first figure...}
+% \pgfmathparse{\the\wd\boxFigOne/\the\ht\boxFigOne > 1.2 ? int(1):int(0)}
 
 % For DEBUGGING \pgfmathsetmacro{\ratio}{\the\ht\boxFigOne/\the\wd\boxFigOne}
 % \pgfmathsetmacro{\ratio}{\the\wd\boxFigOne/\the\ht\boxFigOne}
 % \pgfmathparse{\ratio > 1?int(1):int(0)}
 % Ratio: \ratio
-\pgfmathparse{\the\wd\boxFigOne/\the\ht\boxFigOne > 1.2 ? int(1):int(0)}
+<FIGURE_ONE_LAYOUT>
 
 
 % test orientation
@@ -0,0 +1,20 @@
+""" Booklets of postages (see app.compile_booklet) """
+import os
+
+import app
+
+
+def test_graphicspath_made_absolute(tmp_path):
+    directory = str(tmp_path / 'p1')
+    macros = '\\providecommand{\\kms}{km}\n\\graphicspath{{figs/}{/data/plots/}}'
+    macros, paths = app._booklet_graphicspath(macros, directory)
+    assert '\\graphicspath' not in macros
+    assert '\\providecommand{\\kms}{km}' in macros
+    directory = os.path.abspath(directory)
+    assert paths == '{' + directory + '/}{' + directory + '/figs/}{/data/plots/}'
+
+
+def test_graphicspath_default(tmp_path):
+    macros, paths = app._booklet_graphicspath('\\def\\a{b}', str(tmp_path))
+    assert macros == '\\def\\a{b}'
+    assert paths == '{' + str(tmp_path) + '/}'
@@ -0,0 +1,39 @@
+""" Parsing of whole documents (see app.Document) """
+import app
+
+HEADER = '\\documentclass{aa}\n\\newcommand{\\kms}{km\\,s$^{-1}$}\n'
+BODY = ('\\begin{document}\n\\title{A title}\n\\author{A. Author \\and B. Author}\n'
+        '\\abstract{An abstract.}\n'
+        '\\begin{figure}\\includegraphics{f1.png}\\caption{One}\\label{fig:1}\\end{figure}\n'
+        '\\end{document}\n')
+
+
+def document(tag=''):
+    return app.Document(HEADER + tag + BODY, verbose=False)
+
+
+def test_arxivertag():
+    assert document('%@arxiver{f1.png}\n').arxivertag == 'f1.png'
+    assert document().arxivertag is None
+
+
+def test_unclosed_arxivertag():
+    doc = document('%@arxiver{f1.png\n')
+    assert doc.arxivertag is None
+    assert doc.to_dict()['arxivertag'] is None
+    assert doc.title == 'A title'
+
+
+def test_arxivertag_over_lines():
+    doc = document('%@arxiver{f1.png,\n%  f2.png}\n')
+    assert doc.arxivertag is None
+    assert len(doc.figures) == 1
+
+
+def test_from_dict():
+    doc = document('%@arxiver{f1.png}\n')
+    copy = app.Document.from_dict(doc.to_dict())
+    assert copy.arxivertag == 'f1.png'
+    assert copy.title == doc.title
+    assert copy.abstract == doc.abstract
+    assert [figure.files for figure in copy.figures] == [figure.files for figure in doc.figures]
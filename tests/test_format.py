@@ -0,0 +1,57 @@
+""" Precompiled preambles (see app.ExportPDFLatexTemplate.use_format) """
+import os
+
+import app
+
+
+class Result(object):
+
+    def __init__(self, ok):
+        self.ok = ok
+        self.timed_out = False
+
+
+def template(tmp_path):
+    tpl = app.ExportPDFLatexTemplate()
+    tpl.precompile_preamble = True
+    tpl.format_directory = str(tmp_path)
+    return tpl
+
+
+def dump_format(compiler, directory, fname, **kwargs):
+    """ run_latex replacement writing the format file """
+    name = compiler.split('-jobname=')[1].split()[0]
+    open(os.path.join(directory, name + '.fmt'), 'w').close()
+    return Result(True)
+
+
+def test_format_name_depends_on_compiler(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'run_latex', dump_format)
+    tpl = template(tmp_path)
+    monkeypatch.setattr(app, 'compiler_version', lambda compiler: 'pdfTeX 3.14-2.6-1.40.20')
+    first = tpl.make_format(verbose=False)
+    assert tpl.make_format(verbose=False) == first
+    monkeypatch.setattr(app, 'compiler_version', lambda compiler: 'pdfTeX 3.141-2.6-1.40.25')
+    assert tpl.make_format(verbose=False) != first
+
+
+def test_retry_without_format(tmp_path, monkeypatch):
+    tpl = template(tmp_path)
+    runs = []
+
+    def run_latex(compiler, directory, fname, **kwargs):
+        runs.append(compiler)
+        return Result('-fmt=' not in compiler)
+
+    monkeypatch.setattr(app, 'run_latex', run_latex)
+    result = tpl.run_compiler(tpl.compiler + ' -fmt=postage_x ', str(tmp_path), 'p.tex',
+                              verbose=False)
+    assert result.ok
+    assert len(runs) == 2
+    assert '-fmt=' not in runs[1]
+
+    runs[:] = []
+    monkeypatch.setattr(app, 'run_latex', lambda compiler, *args, **kwargs:
+                        runs.append(compiler) or Result(False))
+    assert not tpl.run_compiler(tpl.compiler, str(tmp_path), 'p.tex', verbose=False).ok
+    assert len(runs) == 1
@@ -0,0 +1,18 @@
+""" MPIA postages (see mpia.MPIATemplate) """
+import app
+import mpia
+
+from test_document import HEADER
+
+NO_FIGURE = ('\\begin{document}\n\\title{A title}\n\\author{A. Author}\n'
+             '\\abstract{An abstract.}\n\\end{document}\n')
+
+
+def test_no_figure(monkeypatch):
+    template = mpia.MPIATemplate()
+    monkeypatch.setattr(template, 'qrcode_to_latex', lambda document: '')
+    document = app.Document(HEADER + NO_FIGURE, verbose=False)
+    txt = template.apply_to_document(document)
+    assert '\\def\\pgfmathresult{0}' in txt
+    assert '<FIGURE_ONE_LAYOUT>' not in txt
+    assert '\\def\\figone{}' in txt
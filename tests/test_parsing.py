@@ -0,0 +1,145 @@
+""" Text scans of the LaTeX sources, compared to the regular expressions
+and loops they replace """
+import re
+
+import pytest
+
+import app
+
+SOURCES = [
+    '',
+    'no command at all\n',
+    # nested braces
+    '\\newcommand{\\kms}{\\ensuremath{{\\rm km\\,s^{-1}}}}\n\\def\\a{{b}{c}}\n',
+    '\\title{A {\\em nested} {title {with} {levels}}} and text}\n',
+    # escaped %
+    'a \\% b % a comment\n\\newcommand{\\pc}{10\\%} % {comment}\n',
+    '100\\%\\% % comment \\% still comment\nnext line %\n',
+    # unclosed commands
+    '\\newcommand{\\a}{x\n\\title{unclosed\n',
+    '}{a} b } {c\n{{d}\n',
+    # commands spanning lines
+    '\\newcommand{\\a}{x\n  y}\n\\title{A\ntitle}\n',
+    '\\renewcommand{\\b}{1}\\newcommand{\\c}{2}\r\n\\providecommand{\\d}{3}',
+    # comments without a final newline, other line breaks
+    'text % last comment',
+    'a\r\nb % c\rd\x0ce % f\u2028g',
+    '%\n%%\n\\%\n',
+]
+
+
+def old_line_spans(data, token):
+    return [match.span() for match in re.finditer('.*' + re.escape(token) + '.*', data)]
+
+
+def old_spans_to_last(data, opening, closing):
+    return [match.span() for match in re.finditer(opening + '.*' + re.escape(closing), data)]
+
+
+def old_command_spans(data, name):
+    return [match.span() for match in re.finditer(r'\\([^\s]*)' + name, data)]
+
+
+def old_balanced_braces(arg):
+    parts = []
+    if '{' not in arg:
+        return parts
+    chars = []
+    num = 0
+    for char in arg:
+        if char == '{':
+            if num > 0:
+                chars.append(char)
+            num += 1
+        elif char == '}':
+            num -= 1
+            if num > 0:
+                chars.append(char)
+            elif num == 0:
+                parts.append(''.join(chars).lstrip().rstrip())
+                chars = []
+        elif num > 0:
+            chars.append(char)
+    return parts
+
+
+def old_clear_comments(data):
+    lines = []
+    for line in data.splitlines():
+        try:
+            start = list(re.compile(r'(?<!\\)%').finditer(line))[0].span()[0]
+            lines.append(line[:start])
+        except IndexError:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def old_clean_latex_comments(code):
+    return re.sub(r'(?<!\\)%.*\n', '', code)
+
+
+@pytest.mark.parametrize('data', SOURCES)
+@pytest.mark.parametrize('token', ['%', '\\', 'command', '{'])
+def test_line_spans(data, token):
+    assert app._line_spans(data, token) == old_line_spans(data, token)
+
+
+@pytest.mark.parametrize('data', SOURCES)
+@pytest.mark.parametrize('opening, closing', [(re.escape('command{'), '}'),
+                                              (re.escape('\\title{'), '}'),
+                                              (re.escape('{'), '}')])
+def test_spans_to_last(data, opening, closing):
+    assert app._spans_to_last(data, opening, closing) == old_spans_to_last(data, opening, closing)
+
+
+@pytest.mark.parametrize('data', SOURCES)
+@pytest.mark.parametrize('name', ['command', 'title', 'a'])
+def test_command_spans(data, name):
+    assert app._command_spans(data, name) == old_command_spans(data, name)
+
+
+@pytest.mark.parametrize('data', SOURCES)
+def test_balanced_braces(data):
+    assert app.balanced_braces(data) == old_balanced_braces(data)
+    assert app.balanced_braces(data, maxparts=1) == old_balanced_braces(data)[:1]
+
+
+@pytest.mark.parametrize('data', SOURCES)
+def test_clear_comments(data):
+    assert app.clear_comments(data) == old_clear_comments(data)
+
+
+@pytest.mark.parametrize('data', SOURCES)
+@pytest.mark.parametrize('blocksize', [1, 7, 1 << 22])
+def test_clean_latex_comments(data, blocksize):
+    cleaned = app.Document._clean_latex_comments(None, data, blocksize=blocksize)
+    assert cleaned == old_clean_latex_comments(data)
+
+
+@pytest.mark.parametrize('data', SOURCES)
+def test_text_hash(data):
+    import hashlib
+    expected = hashlib.sha1(data.encode('utf-8', 'surrogateescape')).hexdigest()
+    assert app.text_hash(data, blocksize=3) == expected
+
+
+@pytest.mark.parametrize('data', SOURCES)
+def test_read_text_mapped(data, tmp_path, monkeypatch):
+    fname = str(tmp_path / 'main.tex')
+    with open(fname, 'w', newline='') as out:
+        out.write(data)
+    with open(fname, 'r', errors='surrogateescape') as fin:
+        expected = fin.read()
+    assert app.read_text(fname) == expected
+    monkeypatch.setattr(app, 'LARGE_DOCUMENT', 0)
+    assert app.read_text(fname) == expected
+
+
+@pytest.mark.parametrize('data', SOURCES)
+def test_large_document_body(data):
+    source = ('\\documentclass{aa}\n' + data + '\n\\begin{document}\n' + data +
+              '\n\\end{document}\n')
+    small = app.Document(source, large=False, verbose=False)
+    large = app.Document(source, large=True, verbose=False)
+    assert large._body == small._body
+    assert large._header == small._header
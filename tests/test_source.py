@@ -0,0 +1,87 @@
+""" Reading of source directories (see app.DocumentSource) """
+import os
+
+import app
+
+MAIN = ('\\documentclass{aa}\n'
+        '\\begin{document}\n'
+        '\\title{A title}\n'
+        '\\input{sec1}\n'
+        '% \\input{old}\n'
+        'text \\input{sec2.tex} trailing text\n'
+        '\\input sec4\n'
+        '\\begin{figure}\\includegraphics{f1.png}\\caption{One}\\end{figure}\n'
+        '\\include{sec3}\n'
+        '\\end{document}\n')
+
+
+def source(tmp_path, files):
+    tmp_path.mkdir(exist_ok=True)
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    return app.DocumentSource(str(tmp_path), verbose=False)
+
+
+def test_expand_inputs(tmp_path):
+    doc = source(tmp_path, {'main.tex': MAIN,
+                            'sec1.tex': 'Section one.',
+                            'sec2.tex': 'Section two.',
+                            'sec3.tex': 'Section three.',
+                            'sec4.tex': 'Section four.',
+                            'old.tex': 'Old section.'})
+    data = doc._code
+    for text in ('Section one.', 'Section two.', 'Section three.', 'Section four.'):
+        assert text in data
+    assert 'Section two.\n\n trailing text' in data
+    assert 'Old section.' not in data
+    assert '\\includegraphics{f1.png}' in data
+    assert '\\input' not in data
+
+
+def test_missing_input(tmp_path):
+    doc = source(tmp_path, {'main.tex': MAIN, 'sec1.tex': 'Section one.'})
+    assert 'Section one.' in doc._code
+    assert '\\input{sec2.tex} trailing text' in doc._code
+
+
+def test_quiet_conversion(tmp_path, capsys):
+    source = tmp_path / 'figure.eps'
+    source.write_text('%!PS')
+
+    def fail(input, output):
+        raise ValueError('cannot convert')
+
+    cache = str(tmp_path / 'cache')
+    for command in (fail, 'false {input} {output}'):
+        assert app.convert_figure(str(source), str(tmp_path / 'figure.pdf'), command,
+                                  cache_directory=cache, key='test', verbose=False) is None
+    assert capsys.readouterr().out == ''
+
+
+def test_cached_compile_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, '__CACHE__', str(tmp_path / 'cache'))
+    monkeypatch.setattr(app, 'run_latex', lambda compiler, directory, fname, **kwargs:
+                        app.LatexResult(compiler, directory, fname))
+    template = app.ExportPDFLatexTemplate()
+    runs = []
+
+    def run_compiler(compiler, directory, fname, **kwargs):
+        result = app.LatexResult(compiler, directory, fname)
+        result.pdf = os.path.join(directory, fname.replace('.tex', '.pdf'))
+        with open(result.pdf, 'w') as out:
+            out.write('%PDF-1.4\n%%EOF\n')
+        runs.append(result)
+        return result
+
+    monkeypatch.setattr(template, 'run_compiler', run_compiler)
+    paper = ('\\documentclass{aa}\n\\begin{document}\n\\title{A title}\n'
+             '\\author{A. Author}\n\\abstract{An abstract.}\n\\end{document}\n')
+    doc = source(tmp_path / 'paper', {'main.tex': paper})
+    first = doc.compile(template=template, verbose=False)
+    assert doc.compile_result is runs[0]
+    second = doc.compile(template=template, verbose=False)
+    assert second == first
+    assert len(runs) == 1
+    assert doc.compile_result is not runs[0]
+    assert doc.compile_result.ok
+    assert doc.compile_result.pdf == second